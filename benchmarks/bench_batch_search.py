@@ -0,0 +1,51 @@
+"""Times batch search (Doc.search(..., batch=True), which needs NumPy) on a
+ColumnarDoc against the regular sentence-by-sentence search, for conditions
+of different selectivity.
+
+Run with conllu_path and numpy importable (e.g. after ``pip install -e .[numpy]``):
+
+    python benchmarks/bench_batch_search.py [nr_sentences]
+"""
+import gc
+import sys
+
+import conllu_path as cp
+from bench_search_cache import SENTENCE, timed
+
+RARE_SENTENCE = SENTENCE.replace('\tsat\tsit\tVERB\tVBD\tMood=Ind|Tense=Past|VerbForm=Fin\t',
+                                 '\tsits\tsit\tVERB\tVBZ\tMood=Sub|Tense=Pres|VerbForm=Fin\t')
+
+EXPRS = [
+    './/[upos=VERB & feats.Mood=Sub]',
+    './/[upos=VERB & feats.Mood=Sub]/[upos=NOUN]',
+    './/[lemma=sit & !feats.Tense=Past]//[upos=DET]',
+    './/[upos=VERB]/[upos=NOUN]',
+    './/[flemma=sit]',
+]
+
+def make_columnar_doc(nr_sentences : int, rare_every : int = 100) -> cp.ColumnarDoc:
+    conllu_str = ''.join('# sent_id = b%d\n%s\n' % (i, RARE_SENTENCE if i % rare_every == 0 else SENTENCE)
+                         for i in range(nr_sentences))
+    return cp.ColumnarDoc.from_sentences(cp.iter_sentences_from_conllu_str(conllu_str))
+
+def uids(matches) -> list:
+    return [(m.node if isinstance(m, cp.Match) else m).uid() for m in matches]
+
+def main():
+    if not cp.batch_available():
+        print('NumPy is not installed; batch search is not available')
+        return
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    doc = make_columnar_doc(nr_sentences)
+    print('sentences: %d, tokens: %d' % (len(doc), len(doc.store)))
+    print('%-48s %8s %10s %10s' % ('expression', 'matches', 'regular', 'batch'))
+    for expr in EXPRS:
+        assert uids(doc.search(expr)) == uids(doc.search(expr, batch=True))
+        gc.collect()
+        regular = timed(lambda: list(doc.search(expr)))
+        gc.collect()
+        batch = timed(lambda: list(doc.search(expr, batch=True)))
+        print('%-48s %8d %8.3f s %8.3f s' % (expr, len(list(doc.search(expr))), regular, batch))
+
+if __name__ == '__main__':
+    main()
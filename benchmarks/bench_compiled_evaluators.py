@@ -0,0 +1,57 @@
+"""Times compiled evaluator conditions (Evaluator.compile()) against interpreting
+the evaluator tree with Evaluator.evaluate(), per node and for whole searches.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_compiled_evaluators.py [nr_sentences]
+"""
+import sys
+
+import conllu_path as cp
+from conllu_path.expr_parser import parse_evaluator
+from bench_search_cache import EXPR, make_doc, timed
+
+CONDITIONS = [
+    '[upos=NOUN]',
+    '[upos=VERB,AUX,NOUN]',
+    '[upos=VERB & feats.Tense=Past]',
+    '[lemma={t.*}]',
+    '[lemma~at]',
+    '[!upos=DET | misc.SpaceAfter=No]',
+    '[flemma=the]',
+]
+
+def interpreted_match(search : cp.Search, tree : cp.Tree) -> list:
+    """Search.match() with every node checked through Evaluator.evaluate()."""
+    def match_recursive(node, sequence):
+        matches = []
+        for n in sequence[0].candidates(node):
+            if sequence[0].evaluator.evaluate(n):
+                if len(sequence) == 1 or match_recursive(n, sequence[1:]):
+                    matches.append(n)
+        return matches
+    return match_recursive(tree, search.evaluator_sequence)
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    doc = make_doc(nr_sentences)
+    nodes = list(doc.iter_nodes())
+    lazy_nodes = list(cp.Doc(cp.iter_sentences_from_conllu_str(doc.to_conllu(), lazy=True)).iter_nodes())
+    print('nodes: %d' % len(nodes))
+    print('%-36s %12s %12s %8s' % ('condition', 'evaluate()', 'compiled', 'speedup'))
+    for expr in CONDITIONS:
+        evaluator = parse_evaluator('.' + expr)[0].evaluator
+        condition = evaluator.compile()
+        assert [evaluator.evaluate(n) for n in lazy_nodes] == [condition(n) for n in lazy_nodes]
+        interpreted = timed(lambda: [n for n in nodes if evaluator.evaluate(n)])
+        compiled = timed(lambda: [n for n in nodes if condition(n)])
+        print('%-36s %9.3f us %9.3f us %7.1fx' % (expr, interpreted / len(nodes) * 1e6,
+                                                 compiled / len(nodes) * 1e6, interpreted / compiled))
+    search = cp.Search(EXPR)
+    interpreted = timed(lambda: [interpreted_match(search, s.root) for s in doc])
+    compiled = timed(lambda: list(doc.search(search)))
+    print('search %s' % EXPR)
+    print('  evaluate(): %.3f s, compiled: %.3f s (%.1fx)' % (interpreted, compiled, interpreted / compiled))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Times the descendant axes ('//', './/') and nested descendant searches on long
+sentences, using the span numbering of Tree.span() against the recursive traversal
+used before.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_descendant_axes.py [sentence_length]
+"""
+import sys
+
+import conllu_path as cp
+from bench_search_cache import timed
+
+EXPRS = [
+    './/[upos=VERB]//[upos=NOUN]',
+    './/[*]//[*]//[upos=DET]',
+    './/[upos=VERB].//[lemma=the]',
+]
+
+def make_sentence(length : int) -> str:
+    """A sentence of clauses chained under each other, each a verb with a noun and
+    a determiner, so that descendant axes reach long spans."""
+    lines = []
+    for i in range(0, length - length % 3, 3):
+        verb, noun, det = i + 1, i + 2, i + 3
+        lines.append('%d\tgoes\tgo\tVERB\tVBZ\t_\t%d\t%s\t_\t_' % (verb, verb - 3 if i else 0, 'ccomp' if i else 'root'))
+        lines.append('%d\tcat\tcat\tNOUN\tNN\t_\t%d\tnsubj\t_\t_' % (noun, verb))
+        lines.append('%d\tthe\tthe\tDET\tDT\t_\t%d\tdet\t_\t_' % (det, noun))
+    return '# sent_id = long\n' + '\n'.join(lines) + '\n\n'
+
+def recursive_traverse(node):
+    """Tree.traverse() as it was implemented before, kept here for comparison."""
+    for child in node.before():
+        for n in recursive_traverse(child):
+            yield n
+    yield node
+    for child in node.after():
+        for n in recursive_traverse(child):
+            yield n
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    sentence = next(cp.iter_sentences_from_conllu_str(make_sentence(length)))
+    nodes = sentence.sequence
+    print('sentence length: %d' % len(nodes))
+    assert [list(recursive_traverse(n)) for n in nodes] == [n.projection() for n in nodes]
+    recursive = timed(lambda: [[c for c in recursive_traverse(n) if c is not n] for n in nodes])
+    spans = timed(lambda: [n.descendants() for n in nodes])
+    print('descendants of every node: recursive %.4f s, spans %.4f s (%.0fx)' % (recursive, spans, recursive / spans))
+    for expr in EXPRS:
+        seconds = timed(lambda: sentence.search(expr))
+        print('%-32s %8.4f s, %d matches' % (expr, seconds, len(sentence.search(expr))))
+
+if __name__ == '__main__':
+    main()
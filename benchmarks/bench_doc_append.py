@@ -0,0 +1,33 @@
+"""Times growing a Doc in batches with +=, with and without a SentenceIndex
+following it, for increasing numbers of batches. The time per batch should
+stay the same as the doc grows.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_doc_append.py [batch_size]
+"""
+import sys
+
+import conllu_path as cp
+from bench_search_cache import make_doc, timed
+
+def grow(sentences : list, batch_size : int, indexed : bool) -> cp.Doc:
+    doc = cp.Doc([])
+    if indexed:
+        doc.build_index()
+    for start in range(0, len(sentences), batch_size):
+        doc += sentences[start:start + batch_size]
+    return doc
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print('%8s %10s %14s %14s' % ('batches', 'sentences', 'ms/batch', 'indexed'))
+    for nr_batches in (500, 1000, 2000, 4000):
+        sentences = list(make_doc(nr_batches * batch_size))
+        plain = timed(lambda: grow(sentences, batch_size, False))
+        indexed = timed(lambda: grow(sentences, batch_size, True))
+        print('%8d %10d %14.4f %14.4f' % (nr_batches, len(sentences), plain * 1000 / nr_batches,
+                                          indexed * 1000 / nr_batches))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Times importing conllu_path and parsing the first expression in fresh
+interpreters, with the parser tables built from the grammar and loaded from
+the parser cache (see PARSER_CACHE in conllu_path/expr_parser.py).
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_import_time.py [nr_runs]
+"""
+import os
+import subprocess
+import sys
+
+CODE = '''
+import time
+start = time.perf_counter()
+import conllu_path
+imported = time.perf_counter()
+conllu_path.Search('.//[upos=VERB]/[deprel=obj]')
+print(imported - start, time.perf_counter() - imported)
+'''
+
+def run(nr_runs : int, cache : str) -> tuple:
+    env = dict(os.environ, CONLLU_PATH_PARSER_CACHE=cache)
+    times = []
+    for _ in range(nr_runs):
+        output = subprocess.run([sys.executable, '-c', CODE], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        times.append([float(t) for t in output.split()])
+    return min(t[0] for t in times), min(t[1] for t in times)
+
+def main():
+    nr_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    run(1, '1') # make sure the cache exists
+    for label, cache in [('no parser cache', '0'), ('parser cache', '1')]:
+        import_time, parse_time = run(nr_runs, cache)
+        print('%-16s import: %6.1f ms, first parse: %6.1f ms' % (label, import_time * 1000, parse_time * 1000))
+
+if __name__ == '__main__':
+    main()
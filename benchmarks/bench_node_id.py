@@ -0,0 +1,92 @@
+"""Microbenchmarks of NodeID against the previous UserString-based implementation.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_node_id.py
+"""
+import re
+import timeit
+from collections import UserString
+from functools import total_ordering
+
+from conllu_path.node_id import NodeID
+
+SYNTACTIC_NODE_ID = re.compile(r'[0-9]+(\.[0-9]+)?')
+MULTIWORD_NODE_ID = re.compile(r'[0-9]+-[0-9]+')
+
+@total_ordering
+class UserStringNodeID(UserString):
+    """NodeID as it was implemented before, kept here for comparison."""
+    def __init__(self, string):
+        super().__init__(string)
+        self._multiword = False
+        self._elided = False
+        self._numeric = None
+        self.validate()
+    def __hash__(self):
+        return hash(str(self))
+    def __contains__(self, item):
+        if isinstance(item, UserStringNodeID):
+            return self._multiword and not item._multiword\
+                and item._numeric[0] in range(self._numeric[0], self._numeric[1]+1)
+        return item in str(self)
+    def __lt__(self, other):
+        if self._numeric[0] == other._numeric[0]:
+            if other in self:
+                return True
+            return self._numeric[1] < other._numeric[1]
+        return self._numeric[0] < other._numeric[0]
+    def __eq__(self, other):
+        return str(self) == str(other)
+    def __gt__(self, other):
+        return self != other and not self < other
+    def validate(self):
+        if MULTIWORD_NODE_ID.match(str(self)):
+            self._multiword = True
+            nr0, nr1 = [int(s) for s in self.split('-')]
+            self._numeric = (nr0, nr1)
+        elif SYNTACTIC_NODE_ID.match(str(self)):
+            if '.' in self:
+                self._elided = True
+                nr0, nr1 = [int(s) for s in self.split('.')]
+                self._numeric = (nr0, nr1)
+            else:
+                self._numeric = (int(self), 0)
+        else:
+            raise Exception('Invalid id "%s"' % self)
+
+ID_STRINGS = [str(i) for i in range(1, 41)] + ['3-4', '12-13', '7.1']
+
+def bench(name : str, fn, number : int = 200):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print('%-12s %-28s %8.2f us' % (name, fn.__name__, seconds * 1e6))
+
+def run(cls):
+    ids = [cls(s) for s in ID_STRINGS]
+    id_dict = {i: i for i in ids}
+    def construct():
+        return [cls(s) for s in ID_STRINGS]
+    def sort():
+        return sorted(reversed(ids))
+    def compare():
+        return [a < b for a in ids[:20] for b in ids[:20]]
+    def hash_lookup():
+        return [id_dict[s] for s in ID_STRINGS]
+    def equality():
+        return [a == b for a, b in zip(ids, reversed(ids))]
+    def sort_by_key():
+        return sorted(reversed(ids), key=cls.sort_key)
+    fns = [construct, sort, compare, hash_lookup, equality]
+    if hasattr(cls, 'sort_key'):
+        fns.append(sort_by_key)
+    for fn in fns:
+        bench(cls.__name__, fn)
+
+def main():
+    assert sorted(NodeID(s) for s in ID_STRINGS if '-' not in s) == \
+           [NodeID(str(s)) for s in sorted(UserStringNodeID(s) for s in ID_STRINGS if '-' not in s)]
+    run(UserStringNodeID)
+    run(NodeID)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Times Doc.search with the compiled-search cache against reparsing per sentence.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_search_cache.py [nr_sentences]
+"""
+import sys
+import time
+
+import conllu_path as cp
+from conllu_path.expr_parser import parse_evaluator
+
+SENTENCE = """1	The	the	DET	DT	Definite=Def|PronType=Art	2	det	_	_
+2	cat	cat	NOUN	NN	Number=Sing	3	nsubj	_	_
+3	sat	sit	VERB	VBD	Mood=Ind|Tense=Past|VerbForm=Fin	0	root	_	_
+4	on	on	ADP	IN	_	6	case	_	_
+5	the	the	DET	DT	Definite=Def|PronType=Art	6	det	_	_
+6	mat	mat	NOUN	NN	Number=Sing	3	obl	_	SpaceAfter=No
+7	.	.	PUNCT	.	_	3	punct	_	_
+"""
+
+EXPR = './/[upos=VERB & feats.Tense=Past]/[upos=NOUN]/[upos=DET | lemma={t.*}]'
+
+def make_doc(nr_sentences : int) -> cp.Doc:
+    conllu_str = ''.join('# sent_id = b%d\n%s\n' % (i, SENTENCE) for i in range(nr_sentences))
+    return cp.Doc(cp.iter_sentences_from_conllu_str(conllu_str))
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    doc = make_doc(nr_sentences)
+    parse_time = timed(lambda: [parse_evaluator(EXPR) for _ in range(1000)]) / 1000
+    uncached = timed(lambda: [m for s in doc for m in cp.Search(parse_evaluator(EXPR)).match(s.root)])
+    cp.Search.clear_cache()
+    cached = timed(lambda: list(doc.search(EXPR)))
+    print('sentences:              %d' % nr_sentences)
+    print('parse per expression:   %.1f us' % (parse_time * 1e6))
+    print('reparsing per sentence: %.3f s (%.1f us/sentence)' % (uncached, uncached / nr_sentences * 1e6))
+    print('compiled once (cached): %.3f s (%.1f us/sentence)' % (cached, cached / nr_sentences * 1e6))
+
+if __name__ == '__main__':
+    main()
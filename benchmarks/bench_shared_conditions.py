@@ -0,0 +1,43 @@
+"""Times running many searches as one SearchBatch against running each of them
+with Doc.search(), on queries that share many of their conditions.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_shared_conditions.py [nr_sentences]
+"""
+import itertools
+import sys
+
+import conllu_path as cp
+from bench_search_cache import make_doc, timed
+
+CONDITIONS = ['upos=VERB', 'upos=NOUN', 'upos=DET', 'upos=ADP', 'deprel=obl', 'deprel=nsubj',
+              'feats.Number=Sing', 'feats.Tense=Past', 'lemma={t.*}', 'misc.SpaceAfter=No']
+
+def make_queries() -> list:
+    queries = []
+    for a, b in itertools.permutations(CONDITIONS, 2):
+        queries.append('.//[%s]/[%s]' % (a, b))
+        queries.append('.//[%s & %s]' % (a, b))
+    for a, b in itertools.combinations(CONDITIONS, 2):
+        queries.append('.//[%s & /[%s]]' % (a, b))
+    return queries
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    doc = make_doc(nr_sentences)
+    queries = make_queries()
+    batch = cp.SearchBatch(queries)
+    print('sentences: %d, queries: %d, %s' % (nr_sentences, len(queries), batch))
+    separate = {}
+    separate_time = timed(lambda: separate.update({q: list(doc.search(q)) for q in queries}))
+    batched = {}
+    batch_time = timed(lambda: batched.update(batch.run(doc)))
+    assert {q: len(m) for q, m in separate.items()} == {q: len(m) for q, m in batched.items()}
+    print('one search at a time: %.3f s' % separate_time)
+    print('SearchBatch.run():    %.3f s (%.1fx)' % (batch_time, separate_time / batch_time))
+    count_time = timed(lambda: batch.count(doc))
+    print('SearchBatch.count():  %.3f s' % count_time)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Times sorting node uids in doc order with Doc.compare_uids() as a comparison
+function, with Doc.sort_uids(), and as integer codes (Doc.encode_uids()), and
+resolving them with get_node() against get_nodes().
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_uid_sort.py [nr_sentences]
+"""
+import functools
+import random
+import sys
+
+from bench_search_cache import make_doc, timed
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    doc = make_doc(nr_sentences)
+    uids = [node.uid() for node in doc.iter_nodes()]
+    random.Random(0).shuffle(uids)
+    print('sentences: %d, uids: %d' % (nr_sentences, len(uids)))
+    compared = timed(lambda: sorted(uids, key=functools.cmp_to_key(doc.compare_uids)))
+    print('sorted(key=cmp_to_key(compare_uids)): %.3f s' % compared)
+    print('sort_uids():                          %.3f s' % timed(lambda: doc.sort_uids(uids)))
+    codes = doc.encode_uids(uids)
+    print('encode_uids():                        %.3f s' % timed(lambda: doc.encode_uids(uids)))
+    print('sorted(codes):                        %.3f s' % timed(lambda: sorted(codes)))
+    print('get_node() for each uid:              %.3f s' % timed(lambda: [doc.get_node(uid) for uid in uids]))
+    print('get_nodes(uids):                      %.3f s' % timed(lambda: doc.get_nodes(uids)))
+    print('get_nodes(codes):                     %.3f s' % timed(lambda: doc.get_nodes(codes)))
+
+if __name__ == '__main__':
+    main()
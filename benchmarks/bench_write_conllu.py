@@ -0,0 +1,67 @@
+"""Throughput of writing conllu output: Doc.to_conllu() and write_conllu() into files,
+streams and gzip files, against building the output by string concatenation.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/bench_write_conllu.py [nr_sentences]
+"""
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import conllu_path as cp
+from conllu_path.conllu import node_to_conllu
+from bench_search_cache import make_doc, timed
+
+def concatenated_sentence(sentence) -> str:
+    """sentence_to_conllu() as it was implemented before, kept here for comparison."""
+    output = ''.join(['# %s\n' % m for m in sentence.meta]) if sentence.meta else ''
+    output += '# sent_id = %s\n' % str(sentence.sent_id)
+    output += '# text = %s\n' % str(sentence.text)
+    for node in sentence.sequence:
+        output += node_to_conllu(node) + '\n'
+    output += '\n'
+    return output
+
+def concatenated_doc(doc) -> str:
+    buffer = ''
+    for sentence in doc:
+        buffer += concatenated_sentence(sentence)
+    return buffer
+
+def report(name : str, seconds : float, nr_bytes : int):
+    print('%-32s %7.3f s %8.1f MB/s' % (name, seconds, nr_bytes / seconds / 1e6))
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    doc = make_doc(nr_sentences)
+    lazy_doc = cp.Doc(cp.iter_sentences_from_conllu_str(doc.to_conllu(), lazy=True))
+    expected = concatenated_doc(doc)
+    assert doc.to_conllu() == expected
+    nr_bytes = len(expected.encode('utf-8'))
+    print('sentences: %d, output: %.1f MB' % (nr_sentences, nr_bytes / 1e6))
+    report('string concatenation', timed(lambda: concatenated_doc(doc)), nr_bytes)
+    report('Doc.to_conllu() string', timed(lambda: doc.to_conllu()), nr_bytes)
+    report('write_conllu() to StringIO', timed(lambda: cp.write_conllu(doc, io.StringIO())), nr_bytes)
+    report('write_conllu() to BytesIO', timed(lambda: cp.write_conllu(doc, io.BytesIO())), nr_bytes)
+    report('write_conllu() from generator', timed(lambda: cp.write_conllu((s for s in doc), io.BytesIO())), nr_bytes)
+    report('write_conllu() lazy nodes', timed(lambda: cp.write_conllu(lazy_doc, io.BytesIO())), nr_bytes)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'out.conllu')
+        report('Doc.to_conllu(filename)', timed(lambda: doc.to_conllu(filename)), nr_bytes)
+        report('Doc.to_conllu(filename.gz)', timed(lambda: doc.to_conllu(filename + '.gz')), nr_bytes)
+        print('peak memory, concatenation:      %.1f MB' % (peak_memory(lambda: concatenated_doc(doc)) / 1e6))
+        print('peak memory, write to file:      %.1f MB' % (peak_memory(lambda: doc.to_conllu(filename)) / 1e6))
+        assert [s.sent_id for s in cp.iter_sentences_from_conllu(filename + '.gz')] == [s.sent_id for s in doc]
+
+if __name__ == '__main__':
+    main()
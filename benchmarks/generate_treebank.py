@@ -0,0 +1,107 @@
+"""Deterministic generator of synthetic UD treebanks in conllu format.
+
+The same parameters and seed always give the same corpus, so benchmark results
+can be compared between releases. To write a corpus into a file:
+
+    python benchmarks/generate_treebank.py out.conllu --sentences 10000 --length 20 --depth 6
+"""
+import argparse
+import random
+
+UPOS_DEPRELS = {
+    'NOUN': ['nsubj', 'obj', 'obl', 'nmod', 'conj'],
+    'PROPN': ['nsubj', 'obj', 'flat', 'nmod'],
+    'PRON': ['nsubj', 'obj', 'iobj'],
+    'VERB': ['ccomp', 'xcomp', 'advcl', 'acl', 'conj'],
+    'AUX': ['aux', 'cop'],
+    'ADJ': ['amod', 'xcomp'],
+    'ADV': ['advmod'],
+    'ADP': ['case', 'fixed'],
+    'DET': ['det'],
+    'CCONJ': ['cc'],
+    'PART': ['mark', 'advmod'],
+    'PUNCT': ['punct'],
+}
+UPOS_WEIGHTS = {'NOUN': 20, 'PROPN': 4, 'PRON': 6, 'VERB': 12, 'AUX': 5, 'ADJ': 8, 'ADV': 5,
+                'ADP': 10, 'DET': 10, 'CCONJ': 3, 'PART': 3, 'PUNCT': 10}
+FEATURES = {
+    'NOUN': {'Number': ['Sing', 'Plur'], 'Case': ['Nom', 'Acc', 'Dat', 'Gen'], 'Gender': ['Masc', 'Fem', 'Neut'],
+             'Definite': ['Def', 'Ind']},
+    'PROPN': {'Number': ['Sing'], 'Gender': ['Masc', 'Fem']},
+    'PRON': {'Number': ['Sing', 'Plur'], 'Person': ['1', '2', '3'], 'Case': ['Nom', 'Acc'], 'PronType': ['Prs']},
+    'VERB': {'Mood': ['Ind', 'Sub', 'Imp'], 'Tense': ['Past', 'Pres', 'Fut'], 'VerbForm': ['Fin', 'Inf', 'Part'],
+             'Number': ['Sing', 'Plur'], 'Person': ['1', '2', '3']},
+    'AUX': {'Mood': ['Ind'], 'Tense': ['Past', 'Pres'], 'VerbForm': ['Fin']},
+    'ADJ': {'Degree': ['Pos', 'Cmp', 'Sup'], 'Number': ['Sing', 'Plur'], 'Gender': ['Masc', 'Fem']},
+    'DET': {'Definite': ['Def', 'Ind'], 'PronType': ['Art', 'Dem']},
+    'ADV': {'Degree': ['Pos', 'Cmp']},
+}
+ROOT_UPOS = ['VERB', 'VERB', 'VERB', 'NOUN', 'ADJ']
+
+def _sentence_lines(rng : random.Random, sent_nr : int, length : int, max_depth : int,
+                    feature_density : float, vocabulary : int, multiword_rate : float) -> list:
+    upos_list = list(UPOS_WEIGHTS)
+    weights = [UPOS_WEIGHTS[u] for u in upos_list]
+    upos = [rng.choices(upos_list, weights)[0] for _ in range(length)]
+    root = rng.randrange(length)
+    upos[root] = rng.choice(ROOT_UPOS)
+    heads, depths = [None] * length, [None] * length
+    heads[root], depths[root] = -1, 0
+    attached = [root]
+    for i in rng.sample([i for i in range(length) if i != root], length - 1):
+        head = rng.choice([a for a in attached if depths[a] < max_depth - 1] or [root])
+        heads[i], depths[i] = head, depths[head] + 1
+        attached.append(i)
+    lines, forms = [], []
+    for i in range(length):
+        lemma = '%s%d' % (upos[i].lower(), rng.randrange(vocabulary))
+        form = lemma if rng.random() < 0.6 else lemma + rng.choice(['s', 'ed', 'ing', 'er'])
+        features = FEATURES.get(upos[i], {})
+        feats = '|'.join('%s=%s' % (k, rng.choice(v)) for k, v in sorted(features.items())
+                         if rng.random() < feature_density) or '_'
+        deprel = 'root' if i == root else rng.choice(UPOS_DEPRELS[upos[i]])
+        misc = 'SpaceAfter=No' if rng.random() < 0.1 else '_'
+        if i + 1 < length and rng.random() < multiword_rate:
+            lines.append('%d-%d\t%s\t_\t_\t_\t_\t_\t_\t_\t_' % (i + 1, i + 2, form + form))
+        lines.append('\t'.join([str(i + 1), form, lemma, upos[i], upos[i][:2], feats,
+                                str(heads[i] + 1), deprel, '_', misc]))
+        forms.append(form)
+    return ['# sent_id = syn-%d' % sent_nr, '# text = %s' % ' '.join(forms)] + lines
+
+def generate_conllu(nr_sentences : int = 1000, length : int = 20, depth : int = 6, feature_density : float = 0.5,
+                    vocabulary : int = 2000, multiword_rate : float = 0.01, seed : int = 0):
+    """Yields the sentences of a synthetic treebank as conllu blocks.
+
+    Args:
+        nr_sentences: Number of sentences.
+        length: Average sentence length; lengths vary between half and one and a half times it.
+        depth: Maximum depth of the trees (the root is at depth 0).
+        feature_density: Probability that each feature applicable to a word's upos is set.
+        vocabulary: Number of distinct lemmas per upos.
+        multiword_rate: Probability that a word starts a multiword token.
+        seed: Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    for sent_nr in range(nr_sentences):
+        sentence_length = rng.randint(max(1, length // 2), max(1, length + length // 2))
+        yield '\n'.join(_sentence_lines(rng, sent_nr, sentence_length, depth, feature_density,
+                                        vocabulary, multiword_rate)) + '\n\n'
+
+def generate_conllu_str(*args, **kwargs) -> str:
+    return ''.join(generate_conllu(*args, **kwargs))
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic conllu treebank.')
+    parser.add_argument('filename')
+    parser.add_argument('--sentences', type=int, default=1000)
+    parser.add_argument('--length', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--feature-density', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with open(args.filename, 'w', encoding='utf-8') as fptr:
+        for block in generate_conllu(args.sentences, args.length, args.depth, args.feature_density, seed=args.seed):
+            fptr.write(block)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark suite for regression tracking: parsing, tree building, each path axis,
+typical searches and writing, on a synthetic treebank from generate_treebank.py.
+
+Each benchmark reports its best time over several runs, its throughput and the
+peak memory it allocates (measured with tracemalloc in a separate run). Results
+are printed as a table and, with --output, written as JSON.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/run_benchmarks.py --sentences 5000 --output results.json
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import conllu_path as cp
+from conllu_path.search_evaluator import ConstantEvaluator, NodePathEvaluator, _AXES
+from generate_treebank import generate_conllu_str
+
+SEARCHES = [
+    './/[upos=VERB]',
+    './/[upos=VERB & feats.Mood=Sub]',
+    './/[upos=VERB]/[deprel=obj]',
+    './/[upos=NOUN]//[upos=DET]',
+    './/[lemma={noun1.*}]',
+    './/[upos=VERB]/[upos=NOUN & !feats.Number=Plur]/[upos=ADP]',
+    './/[*]//[*]//[upos=ADJ]',
+    './/[flemma~adp1]',
+]
+
+def measure(fn, repeat : int) -> dict:
+    """Returns the best time of fn over repeat runs and the peak memory of one more run."""
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_memory_bytes': peak}
+
+def benchmark(results : list, name : str, fn, items : int, unit : str, repeat : int):
+    result = {'name': name, 'items': items, 'unit': unit}
+    result.update(measure(fn, repeat))
+    result['items_per_second'] = items / result['seconds'] if result['seconds'] else None
+    results.append(result)
+    print('%-64s %9.4f s %12.0f %s/s %9.1f MB' % (name, result['seconds'], result['items_per_second'] or 0,
+                                                  unit, result['peak_memory_bytes'] / 1e6))
+
+def run(args) -> dict:
+    conllu_str = generate_conllu_str(args.sentences, args.length, args.depth, args.feature_density, seed=args.seed)
+    doc = cp.Doc(cp.iter_sentences_from_conllu_str(conllu_str))
+    nr_tokens = sum(len(s.sequence) for s in doc)
+    nodes = list(doc.iter_nodes())
+    nr_bytes = len(conllu_str.encode('utf-8'))
+    print('%d sentences, %d tokens, %.1f MB of conllu' % (len(doc), nr_tokens, nr_bytes / 1e6))
+    results = []
+    benchmark(results, 'iter_sentences_from_conllu', lambda: list(cp.iter_sentences_from_conllu_str(conllu_str)),
+              nr_tokens, 'tokens', args.repeat)
+    benchmark(results, 'iter_sentences_from_conllu lazy',
+              lambda: list(cp.iter_sentences_from_conllu_str(conllu_str, lazy=True)), nr_tokens, 'tokens', args.repeat)
+    def build_trees():
+        for sentence in doc:
+            sentence.build_tree()
+    benchmark(results, 'Sentence.build_tree', build_trees, nr_tokens, 'tokens', args.repeat)
+    for path_type in _AXES:
+        evaluator = NodePathEvaluator(path_type, ConstantEvaluator(True))
+        benchmark(results, 'axis %s' % path_type, lambda: [evaluator.find(n) for n in nodes],
+                  len(nodes), 'nodes', args.repeat)
+    for expr in SEARCHES:
+        cp.Search.compile(expr)
+        benchmark(results, 'search %s' % expr, lambda: list(doc.search(expr)), len(doc), 'sentences', args.repeat)
+    benchmark(results, 'Doc.to_conllu', lambda: doc.to_conllu(), nr_bytes, 'bytes', args.repeat)
+    benchmark(results, 'write_conllu to stream', lambda: cp.write_conllu(doc, io.BytesIO()), nr_bytes, 'bytes',
+              args.repeat)
+    return {
+        'corpus': {'sentences': args.sentences, 'length': args.length, 'depth': args.depth,
+                   'feature_density': args.feature_density, 'seed': args.seed,
+                   'tokens': nr_tokens, 'bytes': nr_bytes},
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the conllu_path benchmark suite.')
+    parser.add_argument('--sentences', type=int, default=2000)
+    parser.add_argument('--length', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--feature-density', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='file to write the results into, as JSON')
+    args = parser.parse_args()
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fptr:
+            json.dump(report, fptr, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Runs one compiled Search concurrently from a thread pool and an asyncio executor
+and checks the results against a serial run.
+
+Run with conllu_path importable (e.g. after ``pip install -e .``):
+
+    python benchmarks/stress_concurrent_search.py [nr_sentences] [workers]
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import conllu_path as cp
+from bench_search_cache import make_doc
+
+EXPRESSIONS = [
+    './/[upos=VERB]/[upos=NOUN]/[upos=DET]',
+    './/[upos=NOUN]../[upos=VERB]>[*]',
+    './/[upos=VERB /[deprel=nsubj] !/[deprel=obj]]//[upos=DET]',
+]
+
+def as_uids(matches) -> list:
+    def flatten(m):
+        if isinstance(m, cp.Match):
+            return (m.node.uid(), tuple(flatten(c) for c in m.next_matches))
+        return m.uid()
+    return [flatten(m) for m in matches]
+
+def run_threads(search : cp.Search, doc : cp.Doc, workers : int) -> list:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda s: as_uids(s.search(search)), doc))
+
+async def run_asyncio(search : cp.Search, doc : cp.Doc, workers : int) -> list:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [loop.run_in_executor(executor, lambda s=s: as_uids(s.search(search))) for s in doc]
+        return await asyncio.gather(*futures)
+
+def main():
+    nr_sentences = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    doc = make_doc(nr_sentences)
+    for expr in EXPRESSIONS:
+        search = cp.Search.compile(expr)
+        expected = [as_uids(s.search(search)) for s in doc]
+        for _ in range(3):
+            assert run_threads(search, doc, workers) == expected, 'thread pool mismatch: ' + expr
+            assert asyncio.run(run_asyncio(search, doc, workers)) == expected, 'asyncio mismatch: ' + expr
+        print('ok  %-60s %d matches' % (expr, sum(len(r) for r in expected)))
+
+if __name__ == '__main__':
+    main()
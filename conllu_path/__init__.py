@@ -4,8 +4,18 @@ conllu-path -- a library for searching conllu dependency trees.
 """
 
 from conllu_path.tree import Tree
-from conllu_path.conllu import conllu_to_node, iter_sentences_from_conllu, iter_sentences_from_conllu_str
+from conllu_path.conllu import conllu_to_node, iter_sentences_from_conllu, iter_sentences_from_conllu_str, write_conllu
 from conllu_path.sentence import Doc, Sentence
 from conllu_path.search import Search, Match
+from conllu_path.search_batch import SearchBatch
+from conllu_path.explain import SearchProfile
+from conllu_path.parallel import search_conllu_files
+from conllu_path.stream import search_conllu
+from conllu_path.columnar import ColumnarDoc
+from conllu_path.binary import MappedDoc
+from conllu_path.offsets import LazyDoc, OffsetIndex
+from conllu_path.batch import batch_available
+from conllu_path.index import SentenceIndex
+from conllu_path.planner import NodeStatistics, PlannedSearch
 from conllu_path.exception import ConlluException
 
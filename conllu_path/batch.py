@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import itertools
+from typing import Dict, Generator, List, Tuple
+
+numpy = None # optional dependency, imported on first use so that it does not slow down importing the package
+
+from conllu_path.columnar import ColumnarDoc, _NO_PARENT
+from conllu_path.conllu import conllu_fields, decode_field
+from conllu_path.node_data import NodeData
+from conllu_path.search import Search, Match
+from conllu_path.search_evaluator import Evaluator, ValueComparer, ConstantEvaluator, Operation, Operator
+from conllu_path.tree import Tree
+
+# paths from the root that reach every node of the tree (but the root, for '//')
+_WHOLE_TREE_PATHS = ('.//', '//')
+
+def batch_available() -> bool:
+    """Returns True if NumPy, which batch search needs, is installed."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+    return True
+
+def _field_value(field : str, raw : str, key : List[str]):
+    """Returns the data a node with the raw field value has at key, as NodeData.data() would."""
+    value = decode_field(field, raw)
+    if isinstance(value, NodeData):
+        return value.data(key[1:])
+    return value if len(key) == 1 else None
+
+class TokenMasks:
+    """Evaluates node conditions over all the tokens of a ColumnarDoc at once.
+
+    Each field column is an array of string codes, so a comparison on a field is
+    decided once per distinct code and spread over the column with a lookup table.
+    The masks of the conditions of an and/or/not are combined element-wise.
+    """
+    def __init__(self, doc : ColumnarDoc):
+        self.doc = doc
+        self.nr_strings = len(doc.store.strings)
+        self._columns : Dict[str, numpy.ndarray] = {}
+        self._present : Dict[str, numpy.ndarray] = {}
+
+    def column(self, field : str) -> numpy.ndarray:
+        if field not in self._columns:
+            self._columns[field] = numpy.asarray(memoryview(self.doc.store.columns[field]))
+        return self._columns[field]
+
+    def in_tree(self) -> numpy.ndarray:
+        """Returns the mask of the tokens that are nodes of a sentence tree."""
+        return numpy.asarray(memoryview(self.doc.store.parents)) != _NO_PARENT
+
+    def comparer_mask(self, comparer : ValueComparer) -> numpy.ndarray|None:
+        key = list(comparer.key)
+        if not key or key[0] not in conllu_fields:
+            return None # flemma and other keys that depend on more than one field
+        field = key[0]
+        column = self.column(field)
+        if field not in self._present:
+            self._present[field] = numpy.flatnonzero(numpy.bincount(column, minlength=self.nr_strings))
+        matcher = comparer.value_matcher()
+        strings = self.doc.store.strings
+        table = numpy.zeros(self.nr_strings, dtype=bool)
+        for code in self._present[field].tolist():
+            table[code] = matcher(_field_value(field, strings.string(code), key))
+        return table[column]
+
+    def mask(self, evaluator : Evaluator) -> Tuple[numpy.ndarray|None, bool]:
+        """Returns the mask of the tokens that can match evaluator, and whether the
+        mask is exact. The mask is None if any token can match."""
+        if isinstance(evaluator, ValueComparer):
+            mask = self.comparer_mask(evaluator)
+            return mask, mask is not None
+        if isinstance(evaluator, ConstantEvaluator):
+            return numpy.full(len(self.doc.store), evaluator.evaluate(None), dtype=bool), True
+        if isinstance(evaluator, Operation):
+            left, left_exact = self.mask(evaluator.left)
+            if evaluator.operator == Operator.NOT:
+                return (~left, True) if left_exact else (None, False)
+            right, right_exact = self.mask(evaluator.right)
+            exact = left_exact and right_exact
+            if evaluator.operator == Operator.AND:
+                if left is None or right is None:
+                    return (right if left is None else left), False
+                return left & right, exact
+            if left is None or right is None:
+                return None, False
+            return left | right, exact
+        return None, False # conditions on relatives of the node
+
+def search_batch(doc : ColumnarDoc, src : str|Search, index : 'SentenceIndex' = None) -> Generator[Tree|Match, None, None]:
+    """Searches a ColumnarDoc, evaluating the conditions on the first node of the
+    search path for all tokens at once with NumPy.
+
+    Only sentences with candidate tokens are built. When the path starts with
+    './/' or '//', only the candidate nodes are matched against the rest of the
+    path. The results are the same as those of Doc.search().
+    """
+    if not batch_available():
+        raise Exception('Batch search requires NumPy; install it with "pip install conllu_path[numpy]"')
+    if not isinstance(doc, ColumnarDoc):
+        raise Exception('Batch search needs a ColumnarDoc (see ColumnarDoc.from_sentences())')
+    search = Search.compile(src)
+    sequence = search.evaluator_sequence
+    masks = TokenMasks(doc)
+    mask, _ = masks.mask(sequence[0].evaluator)
+    mask = masks.in_tree() if mask is None else mask & masks.in_tree()
+    tokens = numpy.flatnonzero(mask)
+    offsets = numpy.asarray(memoryview(doc._offsets))
+    positions = numpy.searchsorted(offsets, tokens, side='right') - 1
+    allowed = None
+    if index is not None:
+        if index.nr_sentences != len(doc):
+            raise Exception('Index built for %d sentences used with a doc of %d sentences' %
+                            (index.nr_sentences, len(doc)))
+        candidates = index.candidates(search)
+        allowed = None if candidates is None else set(candidates)
+    direct = type(search) is Search and sequence[0].path_type in _WHOLE_TREE_PATHS
+    condition = sequence[0].condition()
+    for position, group in itertools.groupby(zip(positions.tolist(), tokens.tolist()), key=lambda p: p[0]):
+        if allowed is not None and position not in allowed:
+            continue
+        sentence = doc[position]
+        if not direct:
+            for match in sentence.search(search):
+                yield match
+            continue
+        start = int(offsets[position])
+        nodes = [sentence.sequence[token - start] for _, token in group]
+        nodes.sort(key=lambda n: n.span()[2])
+        if sequence[0].path_type == '//':
+            nodes = [n for n in nodes if n is not sentence.root]
+        for node in nodes:
+            if not condition(node):
+                continue
+            if len(sequence) == 1:
+                yield node
+                continue
+            match = Match(node)
+            if Search._match_recursive(match, sequence[1:]):
+                yield match
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List
+
+from conllu_path.columnar import ColumnarDoc, ColumnStore, StringTable
+from conllu_path.conllu import conllu_fields
+from conllu_path.sentence import Doc
+
+# Binary corpus format, laid out so that it can be used through mmap:
+#
+#   header          magic, version, section counts and positions
+#   string offsets  (nr_strings + 1) uint64 offsets into the string data
+#   string data     UTF-8 encoded strings
+#   token records   nr_tokens records of int32: one string code per conllu field,
+#                   then the index of the token's parent in its sentence
+#   sentence starts (nr_sentences + 1) uint64 positions of the first token
+#   sentence info   nr_sentences records of int32 string codes: sent_id, text,
+#                   meta lines (joined by newlines), sanity comment
+#
+# All numbers are little-endian and every section starts at a multiple of 8 bytes.
+
+_MAGIC = b'CPBIN\x00\x00\x00'
+_VERSION = 1
+_HEADER = struct.Struct('<8sII9Q')
+_RECORD_WIDTH = len(conllu_fields) + 1
+_SENTENCE_INFO_WIDTH = 4
+_NO_STRING = -1
+_META_SEP = '\n'
+
+def _align(fptr, position : int) -> int:
+    padding = -position % 8
+    fptr.write(b'\x00' * padding)
+    return position + padding
+
+class MappedStringTable(StringTable):
+    """String table read from a binary corpus file. Strings are decoded on first use;
+    the string-to-code map is only built if new strings are added."""
+    def __init__(self, offsets : memoryview, data : memoryview):
+        super().__init__()
+        self._offsets = offsets
+        self._data = data
+        self._nr_mapped = len(offsets) - 1
+        self._decoded : Dict[int, str] = {}
+    def string(self, code : int) -> str:
+        if code >= self._nr_mapped:
+            return self._strings[code - self._nr_mapped]
+        string = self._decoded.get(code)
+        if string is None:
+            string = str(self._data[self._offsets[code]:self._offsets[code + 1]], 'utf-8')
+            self._decoded[code] = string
+        return string
+    def code(self, string : str) -> int:
+        if not self._codes and self._nr_mapped:
+            for code in range(self._nr_mapped - 1, -1, -1): # first occurrence wins
+                self._codes[self.string(code)] = code
+        code = self._codes.get(string)
+        if code is None:
+            code = len(self)
+            self._codes[string] = code
+            self._strings.append(string)
+        return code
+    def __len__(self):
+        return self._nr_mapped + len(self._strings)
+
+class MappedDoc(ColumnarDoc):
+    """ColumnarDoc backed by a memory-mapped binary corpus file.
+
+    Opening the file reads only its header. Sentences are read from the mapped
+    file when they are accessed. Nodes can be changed with assign(); the changes
+    are kept in memory and not written to the file. Sentences cannot be added.
+    The file stays mapped until close() is called (or the with block using the
+    doc ends).
+    """
+    def __init__(self, filename : str, view_cache_size : int = 128):
+        super().__init__(view_cache_size)
+        if sys.byteorder != 'little':
+            raise Exception('Binary corpus files can only be mapped on little-endian machines')
+        with open(filename, 'rb') as fptr:
+            self._mmap = mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._buffer = buffer = memoryview(self._mmap)
+        (magic, version, _, nr_strings, nr_tokens, nr_sentences, string_offsets_pos, string_data_pos,
+         tokens_pos, sentence_starts_pos, sentence_info_pos, end_pos) = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise Exception('File "%s" is not a binary corpus' % filename)
+        if version != _VERSION:
+            raise Exception('Unsupported binary corpus version %d in "%s"' % (version, filename))
+        strings = MappedStringTable(buffer[string_offsets_pos:string_data_pos].cast('Q')[:nr_strings + 1],
+                                    buffer[string_data_pos:tokens_pos])
+        records = buffer[tokens_pos:tokens_pos + nr_tokens * _RECORD_WIDTH * 4].cast('i')
+        self.store = ColumnStore(strings, {field: records[i::_RECORD_WIDTH] for i, field in enumerate(conllu_fields)},
+                                 records[len(conllu_fields)::_RECORD_WIDTH])
+        self._offsets = buffer[sentence_starts_pos:sentence_starts_pos + (nr_sentences + 1) * 8].cast('Q')
+        self._sentence_info = buffer[sentence_info_pos:end_pos].cast('i')
+        self._positions = None
+
+    def _info_string(self, position : int, field : int) -> str|None:
+        code = self._sentence_info[position * _SENTENCE_INFO_WIDTH + field]
+        return None if code == _NO_STRING else self.store.strings.string(code)
+    def _sent_id(self, position : int) -> str|None:
+        return self._info_string(position, 0)
+    def _text(self, position : int) -> str|None:
+        return self._info_string(position, 1)
+    def _meta(self, position : int) -> List[str]|None:
+        meta = self._info_string(position, 2)
+        return None if meta is None else meta.split(_META_SEP)
+    def _sanity_comment(self, position : int) -> str:
+        return self._info_string(position, 3) or ''
+    def _position(self, sent_id : str) -> int|None:
+        if self._positions is None:
+            self._positions = {}
+            for position in range(len(self)):
+                self._positions[self._sent_id(position)] = position
+        return self._positions.get(sent_id)
+
+    def append_fields(self, rows : List[List[str]], sent_id : str = None, text : str = None,
+                      meta : List[str] = None):
+        raise Exception('Sentences cannot be added to a memory-mapped doc')
+
+    def close(self):
+        """Unmaps the file. The doc cannot be used afterwards."""
+        if self._mmap is None:
+            return
+        with self._view_lock:
+            self._view_cache.clear()
+        # the mmap can only be closed once no memoryview exports its buffer
+        strings = self.store.strings
+        for view in [*self.store.columns.values(), self.store.parents, strings._offsets, strings._data,
+                     self._offsets, self._sentence_info, self._buffer]:
+            view.release()
+        self._mmap.close()
+        self._mmap = None
+    def __enter__(self) -> MappedDoc:
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+def save_binary(doc : Doc|ColumnarDoc, filename : str):
+    """Saves a doc in the binary corpus format."""
+    if not isinstance(doc, ColumnarDoc):
+        doc = ColumnarDoc.from_sentences(doc)
+    table = doc.store.strings
+    strings = [table.string(code) for code in range(len(table))]
+    codes : Dict[str, int] = {}
+    for code, string in enumerate(strings):
+        codes.setdefault(string, code)
+    def info_code(string : str|None) -> int:
+        if string is None:
+            return _NO_STRING
+        if string not in codes:
+            codes[string] = len(strings)
+            strings.append(string)
+        return codes[string]
+    sentence_info = array('i')
+    for position in range(len(doc)):
+        meta = doc._meta(position)
+        sentence_info.extend([info_code(doc._sent_id(position)), info_code(doc._text(position)),
+                              info_code(None if meta is None else _META_SEP.join(meta)),
+                              info_code(doc._sanity_comment(position) or None)])
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = array('Q', [0])
+    for blob in encoded:
+        string_offsets.append(string_offsets[-1] + len(blob))
+    records = array('i', bytes(4 * _RECORD_WIDTH * len(doc.store)))
+    for i, field in enumerate(conllu_fields):
+        records[i::_RECORD_WIDTH] = array('i', doc.store.columns[field])
+    records[len(conllu_fields)::_RECORD_WIDTH] = array('i', doc.store.parents)
+    sentence_starts = array('Q', doc._offsets)
+    if sys.byteorder != 'little':
+        for a in (string_offsets, records, sentence_starts, sentence_info):
+            a.byteswap()
+    with open(filename, 'wb') as fptr:
+        position = _HEADER.size
+        fptr.write(b'\x00' * position)
+        sections = []
+        for blob in (string_offsets.tobytes(), b''.join(encoded), records.tobytes(),
+                     sentence_starts.tobytes(), sentence_info.tobytes()):
+            position = _align(fptr, position)
+            sections.append(position)
+            fptr.write(blob)
+            position += len(blob)
+        fptr.seek(0)
+        fptr.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(strings), len(doc.store), len(doc),
+                                *sections, position))
+
+def load_binary(filename : str, view_cache_size : int = 128) -> MappedDoc:
+    """Opens a binary corpus file through mmap."""
+    return MappedDoc(filename, view_cache_size)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import threading
+import typing
+import warnings
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Set, Generator, Iterable, Tuple
+
+import conllu_path
+from conllu_path.conllu import conllu_fields, conllu_index_dict, field_is_dict, field_is_set, EMPTY_FIELD
+from conllu_path.conllu import decode_field, encode_field, node_to_conllu, iter_conllu_blocks
+from conllu_path.node_data import NodeData, AssignException
+from conllu_path.search import Search, Match
+from conllu_path.sentence import Sentence, Doc, DocBase
+from conllu_path.tree import Tree
+
+_ROOT = -1 # parent index of the root node
+_NO_PARENT = -2 # parent index of nodes outside the tree (multiword tokens, elided nodes, bad sentences)
+
+class StringTable:
+    """Interns strings, mapping each distinct string to an integer code."""
+    def __init__(self):
+        self._strings : List[str] = []
+        self._codes : Dict[str, int] = {}
+    def code(self, string : str) -> int:
+        code = self._codes.get(string)
+        if code is None:
+            code = len(self._strings)
+            self._codes[string] = code
+            self._strings.append(string)
+        return code
+    def string(self, code : int) -> str:
+        return self._strings[code]
+    def __len__(self):
+        return len(self._strings)
+
+class ColumnStore:
+    """Token fields of a corpus, one array of string codes per conllu field.
+
+    Field values are stored as the raw text of the conllu field (with '_' for
+    empty fields), interned in a shared string table. The tree structure is
+    stored as the index of each token's parent among the tokens of its sentence.
+    """
+    def __init__(self, strings : StringTable = None, columns : Dict[str, typing.MutableSequence[int]] = None,
+                 parents : typing.MutableSequence[int] = None):
+        self.strings = strings if strings is not None else StringTable()
+        self.columns = columns if columns is not None else {field: array('I') for field in conllu_fields}
+        self.parents = parents if parents is not None else array('i')
+    def append(self, fields : List[str]) -> int:
+        for field, value in zip(conllu_fields, fields):
+            self.columns[field].append(self.strings.code(value if value else EMPTY_FIELD))
+        for field in conllu_fields[len(fields):]:
+            self.columns[field].append(self.strings.code(EMPTY_FIELD))
+        self.parents.append(_NO_PARENT)
+        return len(self.parents) - 1
+    def raw(self, field : str, token : int) -> str:
+        return self.strings.string(self.columns[field][token])
+    def set_raw(self, field : str, token : int, value : str):
+        self.columns[field][token] = self.strings.code(value if value else EMPTY_FIELD)
+    def line(self, token : int) -> str:
+        return '\t'.join([self.raw(field, token) for field in conllu_fields])
+    def __len__(self):
+        return len(self.parents)
+
+class ColumnarNodeData(NodeData):
+    """NodeData view of one token in a ColumnStore.
+
+    Plain fields are read straight from the columns. The feats, misc and
+    deps fields are decoded on first access. Assignments are written back
+    to the columns.
+    """
+    def __init__(self, store : ColumnStore, token : int):
+        self._store = store
+        self._token = token
+        self._decoded : Dict[str, NodeData|Tuple[str]] = {}
+
+    def _field(self, field : str) -> NodeData|Tuple[str]|str:
+        if field in field_is_dict or field in field_is_set:
+            if field not in self._decoded:
+                self._decoded[field] = decode_field(field, self._store.raw(field, self._token))
+            return self._decoded[field]
+        return decode_field(field, self._store.raw(field, self._token))
+
+    def keys(self) -> List[str]:
+        return list(conllu_fields)
+    def to_dict(self) -> Dict:
+        return {k: (v.to_dict() if isinstance(v, NodeData) else v)
+                for k, v in ((k, self._field(k)) for k in conllu_fields)}
+    def data(self, path: str | List[str] = None) -> NodeData | Set | str | None:
+        if isinstance(path, str):
+            path = path.split(NodeData.PATH_SEPARATOR)
+        if not path:
+            return self
+        v = self._field(path[0]) if path[0] in conllu_index_dict else None
+        if v is None: return None
+        if isinstance(v, NodeData):
+            return v.data(path[1:])
+        if len(path) == 1:
+            return v
+        return None
+
+    def assign(self, path: str | List[str], value: NodeData | Set | str) -> bool:
+        if isinstance(path, str):
+            path = path.split(NodeData.PATH_SEPARATOR)
+        field = path[0]
+        if field not in conllu_index_dict:
+            raise AssignException('Key %s does not exist!' % field)
+        if len(path) == 1:
+            self._decoded.pop(field, None)
+            if isinstance(value, NodeData):
+                value = value.to_dict()
+        else:
+            v = self._field(field)
+            if not isinstance(v, NodeData):
+                raise AssignException('In path "%s": "%s" does not point to dict-like data.' %
+                                      ('.'.join(path), '.'.join(path[:-1])))
+            v.assign(path[1:], value)
+            value = v.to_dict()
+        self._store.set_raw(field, self._token, encode_field(field, value))
+        return True
+
+class ColumnarSentence(Sentence):
+    """Sentence whose nodes are views of the tokens in a ColumnarDoc.
+
+    The tree is linked from the parent indices computed when the doc was
+    loaded, without checking the sentence again.
+    """
+    def __init__(self, doc : ColumnarDoc, position : int):
+        store = doc.store
+        start, stop = doc._offsets[position], doc._offsets[position + 1]
+        self.position = position
+        self.sequence = [Tree(store.raw('id', token), ColumnarNodeData(store, token))
+                         for token in range(start, stop)]
+        self.sent_id = doc._sent_id(position)
+        self.text = doc._text(position)
+        self.meta = doc._meta(position)
+        self._id_dict = {n.id():n for n in self.sequence}
+        self.root = None
+        self.sanity_comment = doc._sanity_comment(position)
+        self._is_good = not self.sanity_comment
+        if self._is_good:
+            children_dict = defaultdict(list)
+            for node, parent in zip(self.sequence, store.parents[start:stop]):
+                if parent == _ROOT:
+                    self.root = node
+                    node.parent = self
+                elif parent == _NO_PARENT:
+                    node.parent = self
+                else:
+                    children_dict[parent].append(node)
+            for parent, children in children_dict.items():
+                self.sequence[parent].set_children(children)
+
+def _link_sentence(ids : List[str], heads : List[str]) -> Tuple[str, List[int]]:
+    """Checks a sentence the way Sentence.sanity_check() does, and returns the
+    comment (empty if the sentence is good) and the parent index of each token."""
+    parents = [_NO_PARENT] * len(ids)
+    in_tree = [not ('-' in i or '.' in i) for i in ids]
+    if not ids:
+        return "sentence cannot be empty", parents
+    if EMPTY_FIELD in ids or '' in ids:
+        return "every node must have an id", parents
+    if len(ids) != len(set(ids)):
+        return "ids must be unique", parents
+    positions = {i: p for p, (i, t) in enumerate(zip(ids, in_tree)) if t}
+    tree_heads = [h for h, t in zip(heads, in_tree) if t]
+    if EMPTY_FIELD in tree_heads or '' in tree_heads:
+        return "can't build a tree without heads", parents
+    if tree_heads.count('0') != 1:
+        return "tree must have exactly one root", parents
+    if not set(tree_heads).difference(['0']).issubset(positions):
+        return "heads must point to existing nodes", parents
+    for p, (head, t) in enumerate(zip(heads, in_tree)):
+        if t:
+            parents[p] = _ROOT if head == '0' else positions[head]
+    return '', parents
+
+class ColumnarDoc(DocBase):
+    """Doc that keeps its tokens in per-field arrays instead of Tree objects.
+
+    Sentences (ColumnarSentence objects, with Tree nodes) are built only when
+    they are accessed, and the most recently used ones are kept in a small cache,
+    so searching, get_node() etc. work as they do for a Doc.
+
+    Args:
+        view_cache_size: Number of sentence views kept in the cache.
+    """
+    def __init__(self, view_cache_size : int = 128):
+        self.store = ColumnStore()
+        self._offsets = array('L', [0])
+        self._sent_ids : List[str] = []
+        self._texts : List[str] = []
+        self._metas : Dict[int, List[str]] = {}
+        self._sanity_comments : Dict[int, str] = {}
+        self._positions : Dict[str, int] = {}
+        self._view_cache : OrderedDict[int, ColumnarSentence] = OrderedDict()
+        self._view_lock = threading.Lock()
+        self.view_cache_size = view_cache_size
+
+    def append_fields(self, rows : List[List[str]], sent_id : str = None, text : str = None,
+                      meta : List[str] = None):
+        """Adds a sentence given as rows of raw conllu field strings."""
+        position = len(self._sent_ids)
+        comment, parents = _link_sentence([r[0] if r else '' for r in rows],
+                                          [r[conllu_index_dict['head']] if len(r) > conllu_index_dict['head'] else ''
+                                           for r in rows])
+        for row, parent in zip(rows, parents):
+            token = self.store.append(row)
+            self.store.parents[token] = parent
+        self._offsets.append(len(self.store))
+        self._sent_ids.append(sent_id)
+        self._texts.append(text)
+        if meta:
+            self._metas[position] = meta
+        if comment:
+            self._sanity_comments[position] = comment
+        if sent_id in self._positions:
+            warnings.warn('Warning! Sentence ids not unique!')
+        self._positions[sent_id] = position # the last sentence with an id wins, as in a Doc
+
+    def append(self, sentence : Sentence):
+        rows = [node_to_conllu(node).split('\t') for node in sentence.sequence]
+        self.append_fields(rows, sentence.sent_id, sentence.text, sentence.meta)
+
+    @staticmethod
+    def from_sentences(sentences : Iterable[Sentence], view_cache_size : int = 128) -> ColumnarDoc:
+        doc = ColumnarDoc(view_cache_size)
+        for sentence in sentences:
+            doc.append(sentence)
+        return doc
+
+    @staticmethod
+    def from_conllu(file : typing.TextIO | str, view_cache_size : int = 128) -> ColumnarDoc:
+        """Loads a conllu file without building Tree objects for its tokens."""
+        doc = ColumnarDoc(view_cache_size)
+        for node_lines, special_data in iter_conllu_blocks(file):
+            doc.append_fields([line.split('\t') for _, line in node_lines], **special_data)
+        return doc
+
+    def _sent_id(self, position : int) -> str|None:
+        return self._sent_ids[position]
+    def _text(self, position : int) -> str|None:
+        return self._texts[position]
+    def _meta(self, position : int) -> List[str]|None:
+        return self._metas.get(position)
+    def _sanity_comment(self, position : int) -> str:
+        return self._sanity_comments.get(position, '')
+    def _position(self, sent_id : str) -> int|None:
+        return self._positions.get(sent_id)
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state['_view_lock']
+        state['_view_cache'] = OrderedDict()
+        return state
+    def __setstate__(self, state : dict):
+        self.__dict__.update(state)
+        self._view_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+    def __iter__(self) -> Generator[ColumnarSentence, None, None]:
+        for position in range(len(self)):
+            yield self[position]
+    def __getitem__(self, position : int|slice) -> ColumnarSentence|List[ColumnarSentence]:
+        if isinstance(position, slice):
+            return [self[p] for p in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('ColumnarDoc index out of range')
+        with self._view_lock:
+            sentence = self._view_cache.get(position)
+            if sentence is None:
+                sentence = ColumnarSentence(self, position)
+                self._view_cache[position] = sentence
+                if len(self._view_cache) > self.view_cache_size:
+                    self._view_cache.popitem(last=False)
+            else:
+                self._view_cache.move_to_end(position)
+        return sentence
+    def index(self, sentence : Sentence) -> int:
+        if isinstance(sentence, ColumnarSentence) and sentence.position < len(self)\
+                and self._sent_id(sentence.position) == sentence.sent_id:
+            return sentence.position
+        position = self._position(sentence.sent_id) if sentence is not None else None
+        if position is not None:
+            return position
+        raise ValueError('%s is not in doc' % str(sentence))
+
+    def get_sentence(self, sent_id) -> ColumnarSentence|None:
+        position = self._position(sent_id)
+        return None if position is None else self[position]
+
+    def sentence_position(self, sent_id : str) -> int|None:
+        return self._position(sent_id)
+    def build_index(self) -> 'SentenceIndex':
+        return conllu_path.index.SentenceIndex.build(self)
+    def build_statistics(self) -> 'NodeStatistics':
+        return conllu_path.planner.NodeStatistics.build(self)
+    def search_parallel(self, src: str|Search, workers : int = None) -> Generator[Tree|Match, None, None]:
+        return conllu_path.parallel.search_sentences_parallel(self, src, workers)
+    def save_binary(self, filename : str):
+        conllu_path.binary.save_binary(self, filename)
+    @staticmethod
+    def load_binary(filename : str) -> 'MappedDoc':
+        return conllu_path.binary.load_binary(filename)
+    def to_doc(self) -> Doc:
+        """Returns a regular Doc with the same sentences."""
+        return Doc(list(self))
+
+    def __str__(self):
+        return 'ColumnarDoc(%d sentences, %d tokens, %d strings)' % (len(self), len(self.store), len(self.store.strings))
+    def __repr__(self):
+        return str(self)
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import gzip
+import io
 import typing
 import warnings
 from io import StringIO
-from typing import Dict, List, Generator
+from typing import Dict, List, Set, Generator, Iterable, Tuple
 from conllu_path.exception import ConlluException
 from conllu_path.tree import Tree
 from conllu_path.node_id import NodeID
-from conllu_path.node_data import FixedKeysNode, DictNode
+from conllu_path.node_data import NodeData, FixedKeysNode, DictNode, AssignException
 from conllu_path.sentence import Sentence
 
 conllu_fields = ('id', 'form', 'lemma', 'upos', 'xpos', 'feats',
@@ -19,93 +21,215 @@ EMPTY_FIELD = '_'
 DICT_SET_ITEM_SPLIT = '|'
 KEY_VAL_SEP = {'feats': '=', 'misc' : '=', }
 MANY_VALS_SEP = ','
+WRITE_BUFFER_SIZE = 1 << 20
 
 
-def conllu_to_node(source : str, line_nr : int = None) -> Tree:
+def decode_field(label : str, data_str : str|None, line_nr : int = None) -> DictNode|Tuple[str]|List[str]|str:
+    """Decodes the text of a conllu field into node data."""
+    if not data_str or data_str == EMPTY_FIELD:
+        data_str = None
+    if label in field_is_dict:
+        #this field contains a dict
+        items = [] if data_str is None else data_str.split(DICT_SET_ITEM_SPLIT)
+        item_dict = {}
+        for kv_pair in items: # not pythonic, but allows dealing with erroneous data
+            if kv_pair.count(KEY_VAL_SEP[label]) != 1:
+                warnings.warn('Error in field %s, line %d: no key-value separator (%s) present' % (label, line_nr, KEY_VAL_SEP[label]))
+            if KEY_VAL_SEP[label] not in kv_pair:
+                k,v = kv_pair, ['NONE']
+            else:
+                k,v = kv_pair.split(KEY_VAL_SEP[label], 1)
+                v = v.split(MANY_VALS_SEP)
+            item_dict[k] = v
+        # item_dict = {t[0]:set(t[1].split(MANY_VALS_SEP))
+        #              for t in (s.split(KEY_VAL_SEP[label], 1) for s in items)}
+        return DictNode(item_dict)
+    if label in field_is_set:
+        items = () if data_str is None else data_str.split(DICT_SET_ITEM_SPLIT)
+        # data_list.append(set(items))
+        return items
+    return '' if data_str is None else data_str
+
+def encode_field(label : str, data, node : Dict = None) -> str:
+    """Encodes node data (in dict form) as the text of a conllu field."""
+    if not data:
+        data = EMPTY_FIELD
+    elif isinstance(data, str):
+        pass
+        # data = data if data else EMPTY_FIELD
+    elif isinstance(data, dict):
+        data =\
+            DICT_SET_ITEM_SPLIT.join(
+                KEY_VAL_SEP[label].join([
+                    k, MANY_VALS_SEP.join(v) if not isinstance(v, str) else v
+            ])
+        for k,v in data.items())
+    elif isinstance(data, typing.Iterable):
+        data = MANY_VALS_SEP.join([str(i) for i in data])
+    elif isinstance(data, int) or isinstance(data, float):
+        data = str(data)
+    else:
+        raise ConlluException(str(data),
+                'Cannot transform %s item to conllu in %s' % (label, str(node)))
+    return data
+
+class LazyConlluData(NodeData):
+    """NodeData that keeps the conllu line of a node and decodes each field
+    on first access.
+
+    Until the node is changed, node_to_conllu() returns the original line. The
+    feats, misc and deps fields can also be changed in place through the objects
+    data() returns, so those that were decoded are compared with their original
+    text, decoded again, when the node is written.
+    """
+    def __init__(self, source : str, line_nr : int = None):
+        self.source = source.strip()
+        self.line_nr = line_nr
+        self._assigned = False
+        self._raw = self.source.split('\t')
+        self._decoded : Dict[str, NodeData|Tuple[str]|str|None] = {}
+
+    def _field(self, label : str) -> NodeData|Tuple[str]|str|None:
+        if label not in self._decoded:
+            index = conllu_index_dict[label]
+            self._decoded[label] = decode_field(label, self._raw[index], self.line_nr)\
+                if index < len(self._raw) else None
+        return self._decoded[label]
+
+    @property
+    def modified(self) -> bool:
+        """True when the original line no longer matches the node's data."""
+        if self._assigned:
+            return True
+        for label, value in self._decoded.items():
+            if label in field_is_dict or label in field_is_set:
+                index = conllu_index_dict[label]
+                original = decode_field(label, self._raw[index], self.line_nr) if index < len(self._raw) else None
+                if isinstance(value, NodeData):
+                    value, original = value.to_dict(), original.to_dict()
+                if value != original:
+                    return True
+        return False
+
+    def keys(self) -> List[str]:
+        return list(conllu_fields)
+    def to_dict(self) -> Dict:
+        return {k: (v.to_dict() if isinstance(v, NodeData) else v)
+                for k, v in ((k, self._field(k)) for k in conllu_fields)}
+    def data(self, path: str | List[str] = None) -> NodeData | Set | str | None:
+        if isinstance(path, str):
+            path = path.split(NodeData.PATH_SEPARATOR)
+        if not path:
+            return self
+        v = self._field(path[0]) if path[0] in conllu_index_dict else None
+        if v is None: return None
+        if isinstance(v, NodeData):
+            return v.data(path[1:])
+        if len(path) == 1:
+            return v
+        return None
+
+    def assign(self, path: str | List[str], value: NodeData | Set | str) -> bool:
+        if isinstance(path, str):
+            path = path.split(NodeData.PATH_SEPARATOR)
+        if len(path) == 1:
+            if path[0] in conllu_index_dict:
+                self._decoded[path[0]] = value
+                self._assigned = True
+                return True
+            raise AssignException('Key %s does not exist!' % path[0])
+        v = self.data(path[:-1])
+        if isinstance(v, NodeData):
+            v.assign([path[-1]], value)
+            self._assigned = True
+            return True
+        raise AssignException('In path "%s": "%s" does not point to dict-like data.' %
+                        ('.'.join(path), '.'.join(path[:-1])))
+
+def conllu_to_node(source : str, line_nr : int = None, lazy : bool = False) -> Tree:
+    if lazy:
+        data = LazyConlluData(source, line_nr)
+        return Tree(data.sdata('id'), data)
     data_fields = source.strip().split('\t')
     # if len(data_fields) != len(conllu_fields):
     #     raise ConlluException(source, 'Invalid nr of fields', line_nr)
-    data_list = []
-    for label, data_str in zip(conllu_fields, data_fields):
-        # if not data_str or data_str == EMPTY_FIELD:
-        #     data_list.append(None)
-        if not data_str or data_str == EMPTY_FIELD:
-            data_str = None
-
-        if label in field_is_dict:
-            #this field contains a dict
-            items = [] if data_str is None else data_str.split(DICT_SET_ITEM_SPLIT)
-            item_dict = {}
-            for kv_pair in items: # not pythonic, but allows dealing with erroneous data
-                if kv_pair.count(KEY_VAL_SEP[label]) != 1:
-                    warnings.warn('Error in field %s, line %d: no key-value separator (%s) present' % (label, line_nr, KEY_VAL_SEP[label]))
-                if KEY_VAL_SEP[label] not in kv_pair:
-                    k,v = kv_pair, ['NONE']
-                else:
-                    k,v = kv_pair.split(KEY_VAL_SEP[label], 1)
-                    v = v.split(MANY_VALS_SEP)
-                item_dict[k] = v
-            # item_dict = {t[0]:set(t[1].split(MANY_VALS_SEP))
-            #              for t in (s.split(KEY_VAL_SEP[label], 1) for s in items)}
-            data_list.append(DictNode(item_dict))
-        elif label in field_is_set:
-            items = () if data_str is None else data_str.split(DICT_SET_ITEM_SPLIT)
-            # data_list.append(set(items))
-            data_list.append(items)
-        else:
-            data_list.append('' if data_str is None else data_str)
+    data_list = [decode_field(label, data_str, line_nr) for label, data_str in zip(conllu_fields, data_fields)]
     data = FixedKeysNode(data_list, conllu_index_dict)
     return Tree(data.sdata('id'), data)
 
 def node_to_conllu(node : Tree) -> str:
+    data = node.data()
+    if isinstance(data, LazyConlluData) and not data.modified:
+        return data.source
     node = node.to_dict()
-    data_list = []
-    for label in conllu_fields:
-        data = node.get(label)
-        if not data:
-            data = EMPTY_FIELD
-        elif isinstance(data, str):
-            pass
-            # data = data if data else EMPTY_FIELD
-        elif isinstance(data, Dict):
-            data =\
-                DICT_SET_ITEM_SPLIT.join(
-                    KEY_VAL_SEP[label].join([
-                        k, MANY_VALS_SEP.join(v) if not isinstance(v, str) else v
-                ])
-            for k,v in data.items())
-        elif isinstance(data, typing.Iterable):
-            data = MANY_VALS_SEP.join([str(i) for i in data])
-        elif isinstance(data, int) or isinstance(data, float):
-            data = str(data)
-        else:
-            raise ConlluException(str(data),
-                    'Cannot transform %s item to conllu in %s' % (label, str(node)))
-        data_list.append(data)
-    return '\t'.join(data_list)
+    return '\t'.join([encode_field(label, node.get(label), node) for label in conllu_fields])
 
 def sentence_to_conllu(sentence : Sentence) -> str:
-    output = ''.join(['# %s\n' % m for m in sentence.meta]) if sentence.meta else ''
-    output += '# sent_id = %s\n' % str(sentence.sent_id)
-    output += '# text = %s\n' % str(sentence.text)
-    for node in sentence.sequence:
-        output += node_to_conllu(node) + '\n'
-    output += '\n'
-    return output
-
-def iter_sentences_from_conllu(file : typing.TextIO | str) -> Generator[Sentence, None, None]:
+    lines = ['# %s' % m for m in sentence.meta] if sentence.meta else []
+    lines.append('# sent_id = %s' % str(sentence.sent_id))
+    lines.append('# text = %s' % str(sentence.text))
+    lines.extend([node_to_conllu(node) for node in sentence.sequence])
+    lines.append('\n')
+    return '\n'.join(lines)
+
+def write_conllu(sentences : Iterable[Sentence], file : typing.IO | str, compress : bool = None,
+                 buffer_size : int = WRITE_BUFFER_SIZE) -> int:
     """
-    Returns an iterator of sentences from the conllu file
+    Writes sentences in conllu format, buffering the output in blocks of about buffer_size characters
 
-    :param file: filename or string buffer.
+    :param sentences: any iterable of sentences, e.g. a Doc or a generator.
+    :type sentences: Iterable[Sentence]
+    :param file: filename, text stream or binary stream (written as UTF-8).
+    :type file: str or IO
+    :param compress: if True, the output is gzip-compressed; by default, only filenames ending in .gz are.
+    :type compress: bool
+    :return: Number of sentences written.
+    :rtype: int
+    """
+    owned = None
+    if isinstance(file, str):
+        compress = file.endswith('.gz') if compress is None else compress
+        file = owned = gzip.open(file, 'wb') if compress else open(file, 'wb')
+    elif compress:
+        if isinstance(file, io.TextIOBase):
+            raise Exception('Cannot write gzip-compressed output into a text stream')
+        file = owned = gzip.GzipFile(fileobj=file, mode='wb')
+    binary = not isinstance(file, io.TextIOBase)
+    def flush(parts : List[str]):
+        block = ''.join(parts)
+        file.write(block.encode('utf-8') if binary else block)
+    parts, size, count = [], 0, 0
+    try:
+        for sentence in sentences:
+            text = sentence_to_conllu(sentence)
+            parts.append(text)
+            size += len(text)
+            count += 1
+            if size >= buffer_size:
+                flush(parts)
+                parts, size = [], 0
+        if parts:
+            flush(parts)
+    finally:
+        if owned is not None:
+            owned.close()
+    return count
+
+def iter_conllu_blocks(file : typing.TextIO | str) -> Generator[Tuple[List[Tuple[int, str]], Dict], None, None]:
+    """
+    Returns an iterator of the raw sentence blocks in the conllu file
+
+    :param file: filename (gzip-compressed if it ends in .gz) or string buffer.
     :type kind: str or TextIO
-    :return: Generator of sentences.
-    :rtype: Generator[Sentence, None, None]
+    :return: Generator of (node lines, sentence data) tuples, where node lines
+        are (line number, line) tuples and sentence data holds the sent_id, text
+        and meta keyword arguments of the Sentence constructor.
+    :rtype: Generator[Tuple[List[Tuple[int, str]], Dict], None, None]
     """
     if isinstance(file, str):
-        file = open(file, 'r', encoding='utf-8')
+        file = gzip.open(file, 'rt', encoding='utf-8') if file.endswith('.gz') else open(file, 'r', encoding='utf-8')
     line_nr = 0
-    node_sequence = []
+    node_lines = []
     meta_data = []
     special_data = {} # text, sent_id
     while True:
@@ -116,16 +240,14 @@ def iter_sentences_from_conllu(file : typing.TextIO | str) -> Generator[Sentence
         line = line.strip()
         if not line:
             # blank line - yield sentence if have sentence
-            if node_sequence:
+            if node_lines:
                 if meta_data: # add metadata to sentence **kwargs
                     special_data.update({'meta':meta_data})
-                sentence = Sentence(node_sequence, **(special_data))
-                if not sentence.root:
-                    warnings.warn('Error building sentence sent_id = %s: %s' % (sentence.sent_id, sentence.sanity_comment))
-                node_sequence = []
+                block = (node_lines, special_data)
+                node_lines = []
                 meta_data = []
                 special_data = {}  # text, sent_id
-                yield sentence
+                yield block
             continue
         if line[0] == '#':# comment
             line = line[1:] # strip #
@@ -137,13 +259,30 @@ def iter_sentences_from_conllu(file : typing.TextIO | str) -> Generator[Sentence
                     continue
             meta_data.append(line.strip())
             continue
-        node_sequence.append(conllu_to_node(line, line_nr))
-    if node_sequence:
+        node_lines.append((line_nr, line))
+    if node_lines:
         if meta_data:  # add metadata to sentence **kwargs
             special_data.update({'meta': meta_data})
-        yield Sentence(node_sequence, **(special_data))
+        yield node_lines, special_data
     file.close()
 
-def iter_sentences_from_conllu_str(conllu_str: str) -> Generator[Sentence, None, None]:
-    return iter_sentences_from_conllu(StringIO(conllu_str))
+def iter_sentences_from_conllu(file : typing.TextIO | str, lazy : bool = False) -> Generator[Sentence, None, None]:
+    """
+    Returns an iterator of sentences from the conllu file
+
+    :param file: filename or string buffer.
+    :type kind: str or TextIO
+    :param lazy: if True, node fields are decoded only when first accessed.
+    :type lazy: bool
+    :return: Generator of sentences.
+    :rtype: Generator[Sentence, None, None]
+    """
+    for node_lines, special_data in iter_conllu_blocks(file):
+        sentence = Sentence([conllu_to_node(line, line_nr, lazy) for line_nr, line in node_lines], **(special_data))
+        if not sentence.root:
+            warnings.warn('Error building sentence sent_id = %s: %s' % (sentence.sent_id, sentence.sanity_comment))
+        yield sentence
+
+def iter_sentences_from_conllu_str(conllu_str: str, lazy : bool = False) -> Generator[Sentence, None, None]:
+    return iter_sentences_from_conllu(StringIO(conllu_str), lazy)
 
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import time
+from typing import Iterable, List
+
+from conllu_path.search import Search
+from conllu_path.search_evaluator import Evaluator, Predicate, Operation, NodePathEvaluator, _AXES
+from conllu_path.sentence import Sentence
+from conllu_path.tree import Tree
+
+class EvaluatorStats:
+    """What an evaluator did during a profiled search.
+
+    For conditions, calls counts the nodes the condition was checked on and matches
+    those it held for. For paths, calls counts the nodes the path started from, nodes
+    the nodes it reached and matches those of them that met the path's condition.
+    Times are cumulative, i.e. they include the time of the nested evaluators.
+    """
+    def __init__(self, evaluator : Evaluator, depth : int):
+        self.evaluator = evaluator
+        self.depth = depth
+        self.calls = 0
+        self.nodes = 0
+        self.matches = 0
+        self.seconds = 0.0
+
+    def match_rate(self) -> float|None:
+        total = self.nodes if isinstance(self.evaluator, NodePathEvaluator) else self.calls
+        return self.matches / total if total else None
+
+    def label(self) -> str:
+        if isinstance(self.evaluator, NodePathEvaluator):
+            return self.evaluator.path_type + '[]'
+        if isinstance(self.evaluator, Operation):
+            return self.evaluator.operator.value
+        return str(self.evaluator)
+
+class SearchProfile:
+    """Statistics of running a search with every evaluator instrumented, as returned
+    by Search.explain(). str() gives a table of the evaluators in expression order."""
+    def __init__(self, search : Search):
+        self.search = search
+        self.stats : List[EvaluatorStats] = []
+        self.sentences = 0
+        self.results = 0
+        self.seconds = 0.0
+        self.instrumented = Search([self._path(path, 0) for path in search.evaluator_sequence])
+
+    def _add(self, evaluator : Evaluator, depth : int) -> EvaluatorStats:
+        stats = EvaluatorStats(evaluator, depth)
+        self.stats.append(stats)
+        return stats
+
+    def _path(self, path : NodePathEvaluator, depth : int) -> NodePathEvaluator:
+        stats = self._add(path, depth)
+        condition = self._compile(path.evaluator, depth + 1)
+        return _ProfiledPath(path, condition, stats)
+
+    def _compile(self, evaluator : Evaluator, depth : int) -> Predicate:
+        """Compiles evaluator with every nested evaluator counting its calls and timing them."""
+        stats = self._add(evaluator, depth)
+        if isinstance(evaluator, NodePathEvaluator):
+            axis = _AXES.get(evaluator.path_type)
+            if axis is None:
+                raise Exception("Unknown path " + str(evaluator.path_type))
+            condition = self._compile(evaluator.evaluator, depth + 1)
+            def predicate(node : Tree) -> bool:
+                for n in axis(node):
+                    stats.nodes += 1
+                    if condition(n):
+                        return True
+                return False
+        else:
+            child_depth = depth + 1
+            predicate = evaluator.compile(lambda child: self._compile(child, child_depth))
+        return _timed(predicate, stats)
+
+    def run(self, sentences : Iterable[Sentence]|Sentence):
+        if isinstance(sentences, Sentence):
+            sentences = [sentences]
+        start = time.perf_counter()
+        for sentence in sentences:
+            self.sentences += 1
+            self.results += len(self.instrumented.match(sentence.root))
+        self.seconds += time.perf_counter() - start
+
+    def __str__(self):
+        expr = self.search.expr_src if self.search.expr_src is not None else str(self.search)
+        lines = ['%s: %d results in %d sentences, %.3f ms' % (expr, self.results, self.sentences, self.seconds * 1000),
+                 '%10s %10s %10s %7s %10s  %s' % ('calls', 'nodes', 'matches', 'rate', 'ms', 'evaluator')]
+        for stats in self.stats:
+            rate = stats.match_rate()
+            lines.append('%10d %10s %10d %7s %10.3f  %s%s' % (
+                stats.calls, stats.nodes if isinstance(stats.evaluator, NodePathEvaluator) else '',
+                stats.matches, '' if rate is None else '%.1f%%' % (rate * 100), stats.seconds * 1000,
+                '  ' * stats.depth, stats.label()))
+        return '\n'.join(lines)
+    def __repr__(self):
+        return 'SearchProfile(%s)' % self.search
+
+def _timed(predicate : Predicate, stats : EvaluatorStats) -> Predicate:
+    clock = time.perf_counter
+    def timed(node : Tree) -> bool:
+        start = clock()
+        result = predicate(node)
+        stats.seconds += clock() - start
+        stats.calls += 1
+        if result:
+            stats.matches += 1
+        return result
+    return timed
+
+class _ProfiledPath(NodePathEvaluator):
+    """Step of the evaluator sequence that records the nodes it visits and finds."""
+    def __init__(self, path : NodePathEvaluator, condition : Predicate, stats : EvaluatorStats):
+        super().__init__(path.path_type, path.evaluator)
+        self._compiled = condition
+        self._stats = stats
+    def find(self, node : Tree) -> List[Tree]:
+        stats = self._stats
+        start = time.perf_counter()
+        candidates = self.candidates(node)
+        found = [n for n in candidates if self._compiled(n)]
+        stats.seconds += time.perf_counter() - start
+        stats.calls += 1
+        stats.nodes += len(candidates)
+        stats.matches += len(found)
+        return found
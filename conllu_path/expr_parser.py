@@ -1,3 +1,8 @@
+from __future__ import annotations
+
+import os
+import threading
+import warnings
 from typing import List
 
 import lark
@@ -79,11 +84,48 @@ class ExpressionBuilder(lark.Transformer):
             return [args[0].value]
         return args[0] + [args[1].value]
 
-_parser = lark.Lark(grammar, start="node_list", parser="lalr", transformer=ExpressionBuilder())
+# Whether the parser tables are cached between processes (off by default): False to always
+# build them from the grammar, True for a file in a directory only the user can access
+# (see _cache_file()), or a file name. The cache file is unpickled when loaded, so it must
+# not be writable by others. The cache is keyed by the grammar, the parser options and the
+# lark and Python versions, and is rebuilt when any of them changes. Can be set with the
+# CONLLU_PATH_PARSER_CACHE environment variable ("1" to enable it, "0" or empty to disable
+# it; other values are ignored with a warning), or here before the first expression is parsed.
+PARSER_CACHE = os.environ.get('CONLLU_PATH_PARSER_CACHE', '')
+if PARSER_CACHE not in ('0', '1', ''):
+    warnings.warn('CONLLU_PATH_PARSER_CACHE must be "0", "1" or empty, not "%s"; the parser cache is off' % PARSER_CACHE)
+PARSER_CACHE = PARSER_CACHE == '1'
+
+_parser = None
+_parser_lock = threading.Lock()
+
+def _cache_file() -> str|None:
+    """Returns the parser cache file in the user's cache directory, creating the directory
+    with mode 0700, or None if it cannot be created or others can write to it."""
+    directory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'conllu_path')
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        stat = os.stat(directory)
+    except OSError:
+        return None
+    if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+        return None
+    return os.path.join(directory, 'expr_parser.cache')
+
+def get_parser() -> lark.Lark:
+    """Returns the expression parser, building it (or loading it from PARSER_CACHE) on first use."""
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                cache = _cache_file() if PARSER_CACHE is True else PARSER_CACHE
+                _parser = lark.Lark(grammar, start="node_list", parser="lalr", transformer=ExpressionBuilder(),
+                                    cache=cache or False)
+    return _parser
 
 def parse_evaluator(expr : str) -> List[NodePathEvaluator]:
     try:
-        return _parser.parse(expr)
+        return get_parser().parse(expr)
     except lark.UnexpectedInput as unex_input_e:
         index = unex_input_e.column
         e_with_error = expr[:index] + 'ˇ' + expr[index:]
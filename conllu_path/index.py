@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import bisect
+import json
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+from conllu_path.search import Search
+from conllu_path.search_evaluator import Evaluator, ValueComparer, Operation, Operator, NodePathEvaluator
+from conllu_path.sentence import Sentence, Doc, DocObserver
+
+INDEXED_FIELDS = ('lemma', 'upos', 'deprel')
+INDEXED_DICT_FIELDS = ('feats',)
+INDEXED_KEY_FIELDS = ('misc',)
+TERM_VALUE_SEP = '='
+
+_MAGIC = b'CPIDX'
+_VERSION = 1
+_POSTING_TYPECODE = 'I'
+
+def _term(key : List[str], value : str = None) -> str:
+    return '.'.join(key) + ('' if value is None else TERM_VALUE_SEP + value)
+
+def node_terms(node) -> Set[str]:
+    """Returns the index terms for a node: field=value for the indexed fields,
+    feats.X=Y for each feature value, and misc.X for each misc key."""
+    terms = set()
+    for field in INDEXED_FIELDS:
+        value = node.sdata(field)
+        if value:
+            terms.add(_term([field], value))
+    for field in INDEXED_DICT_FIELDS:
+        field_data = node.data(field)
+        for key in field_data.keys() if field_data is not None else []:
+            values = field_data.data(key)
+            for value in [values] if isinstance(values, str) else values:
+                terms.add(_term([field, key], value))
+    for field in INDEXED_KEY_FIELDS:
+        field_data = node.data(field)
+        for key in field_data.keys() if field_data is not None else []:
+            terms.add(_term([field, key]))
+    return terms
+
+class SentenceIndex(DocObserver):
+    """Inverted index from node field values to the positions of the sentences
+    containing them, used to skip sentences that cannot match a search.
+
+    Positions are the indices of the sentences in the doc or file the index was
+    built from. Posting lists are sorted arrays of positions. Saved indexes
+    are read lazily: a posting list is decoded only when a search uses its term.
+
+    An index built with Doc.build_index() follows the changes of the doc: added
+    sentences are indexed, and the sentence of a changed node is added to the
+    postings of the node's new terms. It is not removed from the postings of the
+    terms the node no longer has, so those only select a few extra candidates.
+    """
+    def __init__(self, postings : Dict[str, array] = None, nr_sentences : int = 0):
+        self._postings = postings if postings is not None else {}
+        self._offsets : Dict[str, List[int]] = {}
+        self._buffer = None
+        self.nr_sentences = nr_sentences
+
+    @staticmethod
+    def build(sentences : Iterable[Sentence]) -> SentenceIndex:
+        postings = defaultdict(lambda: array(_POSTING_TYPECODE))
+        position = -1
+        for position, sentence in enumerate(sentences):
+            terms = set()
+            for node in sentence.sequence:
+                terms.update(node_terms(node))
+            for term in terms:
+                postings[term].append(position)
+        return SentenceIndex(dict(postings), position + 1)
+
+    def _add_terms(self, position : int, terms : Iterable[str]):
+        for term in terms:
+            posting = self.postings(term)
+            if term not in self._postings:
+                posting = self._postings[term] = array(_POSTING_TYPECODE)
+            at = bisect.bisect_left(posting, position)
+            if at == len(posting) or posting[at] != position:
+                posting.insert(at, position)
+
+    def sentences_added(self, doc : Doc, start : int):
+        if start != self.nr_sentences:
+            return self.doc_reset(doc)
+        for position in range(start, len(doc)):
+            terms = set()
+            for node in doc[position].sequence:
+                terms.update(node_terms(node))
+            self._add_terms(position, terms)
+        self.nr_sentences = len(doc)
+
+    def node_changed(self, doc : Doc, position : int, node : 'Tree', path : str|List[str]):
+        self._add_terms(position, node_terms(node))
+
+    def doc_reset(self, doc : Doc):
+        index = SentenceIndex.build(doc)
+        self._postings, self._offsets, self._buffer = index._postings, {}, None
+        self.nr_sentences = index.nr_sentences
+
+    def terms(self) -> List[str]:
+        return list(self._postings.keys()) + [t for t in self._offsets if t not in self._postings]
+
+    def postings(self, term : str) -> array:
+        """Returns the sorted positions of the sentences containing term."""
+        if term not in self._postings:
+            if term not in self._offsets:
+                return array(_POSTING_TYPECODE)
+            offset, count = self._offsets[term]
+            posting = array(_POSTING_TYPECODE)
+            posting.frombytes(self._buffer[offset:offset + count * posting.itemsize])
+            if sys.byteorder == 'big':
+                posting.byteswap()
+            self._postings[term] = posting
+        return self._postings[term]
+
+    def candidates(self, search : str|Search) -> List[int]|None:
+        """Returns the sorted positions of the sentences that can match the search,
+        or None if the index cannot narrow the search down."""
+        candidates = _and(_evaluator_candidates(self, e) for e in Search.compile(search).evaluator_sequence)
+        return None if candidates is None else sorted(candidates)
+
+    def save(self, filename : str):
+        terms = self.terms()
+        offsets, blobs, offset = {}, [], 0
+        for term in terms:
+            posting = array(_POSTING_TYPECODE, self.postings(term))
+            if sys.byteorder == 'big':
+                posting.byteswap()
+            blob = posting.tobytes()
+            offsets[term] = [offset, len(posting)]
+            blobs.append(blob)
+            offset += len(blob)
+        header = json.dumps({'version': _VERSION, 'nr_sentences': self.nr_sentences,
+                             'terms': offsets}, ensure_ascii=False).encode('utf-8')
+        with open(filename, 'wb') as fptr:
+            fptr.write(_MAGIC + struct.pack('<Q', len(header)))
+            fptr.write(header)
+            for blob in blobs:
+                fptr.write(blob)
+
+    @staticmethod
+    def load(filename : str) -> SentenceIndex:
+        with open(filename, 'rb') as fptr:
+            content = fptr.read()
+        if not content.startswith(_MAGIC):
+            raise Exception('File "%s" is not a sentence index' % filename)
+        start = len(_MAGIC) + 8
+        header_len, = struct.unpack('<Q', content[len(_MAGIC):start])
+        header = json.loads(content[start:start + header_len].decode('utf-8'))
+        if header.get('version') != _VERSION:
+            raise Exception('Unsupported sentence index version %s in "%s"' % (str(header.get('version')), filename))
+        index = SentenceIndex(nr_sentences=header['nr_sentences'])
+        index._offsets = header['terms']
+        index._buffer = memoryview(content)[start + header_len:]
+        return index
+
+    def __str__(self):
+        return 'SentenceIndex(%d sentences, %d terms)' % (self.nr_sentences, len(self.terms()))
+    def __repr__(self):
+        return str(self)
+
+def _and(candidate_sets : Iterable[Set[int]|None]) -> Set[int]|None:
+    result = None
+    for candidates in candidate_sets:
+        if candidates is not None:
+            result = candidates if result is None else result & candidates
+    return result
+
+def _or(candidate_sets : Iterable[Set[int]|None]) -> Set[int]|None:
+    result = set()
+    for candidates in candidate_sets:
+        if candidates is None:
+            return None
+        result |= candidates
+    return result
+
+def _comparer_terms(comparer : ValueComparer) -> List[str]|None:
+    """Returns the index terms of which a node matching comparer must have at least one,
+    or None if the comparison cannot be looked up in the index."""
+    key = list(comparer.key)
+    if len(key) == 2 and key[0] in INDEXED_KEY_FIELDS: # any comparison requires the key
+        return [_term(key)]
+    values = comparer.literal_values()
+    if comparer.operator != '=' or values is None:
+        return None
+    if len(key) == 1 and key[0] in INDEXED_FIELDS:
+        return [_term(key, v) for v in values]
+    if len(key) == 2 and key[0] in INDEXED_DICT_FIELDS:
+        return [_term(key, v) for v in values]
+    return None
+
+def _evaluator_candidates(index : SentenceIndex, evaluator : Evaluator) -> Set[int]|None:
+    """Returns the positions of the sentences that can contain a node matching
+    evaluator, or None if any sentence can."""
+    if isinstance(evaluator, NodePathEvaluator):
+        return _evaluator_candidates(index, evaluator.evaluator)
+    if isinstance(evaluator, ValueComparer):
+        terms = _comparer_terms(evaluator)
+        if terms is None:
+            return None
+        return _or(set(index.postings(t)) for t in terms)
+    if isinstance(evaluator, Operation):
+        if evaluator.operator == Operator.AND:
+            return _and([_evaluator_candidates(index, evaluator.left),
+                         _evaluator_candidates(index, evaluator.right)])
+        if evaluator.operator == Operator.OR:
+            return _or([_evaluator_candidates(index, evaluator.left),
+                        _evaluator_candidates(index, evaluator.right)])
+    return None # negations and constants can match in any sentence
@@ -1,58 +1,96 @@
 from __future__ import annotations
 
-import re
-from collections import UserString
-from functools import total_ordering
+from typing import Dict, Tuple
 
-SYNTACTIC_NODE_ID = re.compile(r'[0-9]+(\.[0-9]+)?')
-MULTIWORD_NODE_ID = re.compile(r'[0-9]+-[0-9]+')
+_MULTIWORD = 0
+_SYNTACTIC = 1
+_ELIDED = 2
 
-@total_ordering
-class NodeID(UserString):
-    def __init__(self, string):
-        super().__init__(string)
-        self._multiword = False
-        self._elided = False
-        self._numeric = None
-        self.validate()
+# ids are immutable, so the ones seen most often are shared
+_INTERN_LIMIT = 10000
+_interned : Dict[str, 'NodeID'] = {}
+
+def _parse_numeric(string : str) -> int:
+    if not (string.isascii() and string.isdigit()):
+        raise Exception('Invalid id "%s"' % string)
+    return int(string)
+
+class NodeID:
+    """Id of a node in a sentence: a syntactic word id ("3"), an elided node
+    id ("3.1") or a multiword token range ("3-4").
+
+    Equality and hashing are those of the id string, so a NodeID can be looked
+    up with a plain string. Ordering compares the integer key returned by
+    sort_key(): ids are ordered by number, a multiword token comes before
+    the words it contains, and elided nodes come after the word they follow.
+    """
+    __slots__ = ('_str', '_numeric', '_kind', '_hash', '_key')
+    def __new__(cls, string : str|NodeID):
+        if isinstance(string, NodeID):
+            return string
+        string = str(string)
+        node_id = _interned.get(string)
+        if node_id is not None:
+            return node_id
+        node_id = super().__new__(cls)
+        node_id._str = string
+        node_id._hash = hash(string)
+        node_id.validate()
+        if len(_interned) < _INTERN_LIMIT:
+            _interned[string] = node_id
+        return node_id
+    def __getnewargs__(self):
+        return (self._str,)
+    def __getstate__(self):
+        return None
+    def __str__(self):
+        return self._str
+    def __repr__(self):
+        return repr(self._str)
+    def __len__(self):
+        return len(self._str)
     def __hash__(self):
-        return hash(str(self))
+        return self._hash
     def __contains__(self, item : 'NodeID'|str):
         if isinstance(item, NodeID): # self a multiword node that contains item?
-            return self._multiword and not item._multiword\
-                and item._numeric[0] in range(self._numeric[0], self._numeric[1]+1)
-        return item in str(self)
-    def __lt__(self, other : 'NodeID'):
-        if self._numeric[0] == other._numeric[0]:
-            if other in self: # self is multimword and contains other
-                return True
-            return self._numeric[1] < other._numeric[1] # two elided nodes
-        return self._numeric[0] < other._numeric[0]
+            return self._kind == _MULTIWORD and item._kind != _MULTIWORD\
+                and self._numeric[0] <= item._numeric[0] <= self._numeric[1]
+        return item in self._str
     def __eq__(self, other):
-        return str(self) == str(other)
+        if isinstance(other, NodeID):
+            return self._str == other._str
+        return self._str == str(other)
+    def __ne__(self, other):
+        return not self == other
+    def __lt__(self, other : 'NodeID'):
+        return self._key < other._key
+    def __le__(self, other : 'NodeID'):
+        return self._key < other._key or self == other
     def __gt__(self, other : 'NodeID'):
-        return self != other and not self < other
-    # def __le__(self, other):
-    #     return not self > other
-    # def __ge__(self, other):
-    #     return not self < other
+        return self._key > other._key
+    def __ge__(self, other : 'NodeID'):
+        return self._key > other._key or self == other
+    def sort_key(self) -> Tuple[int, int, int]:
+        return self._key
     def validate(self):
-        if MULTIWORD_NODE_ID.match(str(self)):
-            self._multiword = True
-            nr0, nr1 = [int(s) for s in self.split('-')]
-            self._numeric = (nr0, nr1)
-        elif SYNTACTIC_NODE_ID.match(str(self)):
-            if '.' in self:
-                self._elided = True
-                nr0, nr1 = [int(s) for s in self.split('.')]
-                self._numeric = (nr0, nr1)
-            else:
-                self._numeric = (int(self), 0)
+        string = self._str
+        if '-' in string:
+            self._kind = _MULTIWORD
+            nr0, _, nr1 = string.partition('-')
+        elif '.' in string:
+            self._kind = _ELIDED
+            nr0, _, nr1 = string.partition('.')
         else:
-            raise Exception('Invalid id "%s"' % self)
+            self._kind = _SYNTACTIC
+            nr0, nr1 = string, '0'
+        try:
+            self._numeric = (_parse_numeric(nr0), _parse_numeric(nr1))
+        except Exception:
+            raise Exception('Invalid id "%s"' % string) from None
+        self._key = (self._numeric[0], self._kind, self._numeric[1])
     def elided(self) -> bool:
-        return self._elided
+        return self._kind == _ELIDED
     def multiword(self) -> bool:
-        return self._multiword
+        return self._kind == _MULTIWORD
     def in_tree(self) -> bool:
-        return not self.multiword() and not self.elided()
+        return self._kind == _SYNTACTIC
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import sys
+import threading
+import warnings
+from array import array
+from collections import OrderedDict
+from io import StringIO
+from typing import Dict, Generator, List
+
+import conllu_path
+from conllu_path.conllu import conllu_to_node, iter_conllu_blocks
+from conllu_path.search import Search, Match
+from conllu_path.sentence import Doc, DocBase, Sentence
+from conllu_path.tree import Tree
+
+_MAGIC = b'CPOFF'
+_VERSION = 1
+_OFFSET_TYPECODE = 'Q'
+
+def _sent_id_of_comment(line : bytes) -> str|None:
+    """Returns the sent_id set by a comment line, the same way iter_conllu_blocks() reads it."""
+    line = line.decode('utf-8')[1:]
+    if '=' not in line:
+        return None
+    k, arg = line.split('=', 1)
+    return arg.strip() if k.strip() == 'sent_id' else None
+
+class OffsetIndex:
+    """Byte ranges of the sentences of a conllu file, in file order.
+
+    The range of a sentence starts right after the blank line ending the previous
+    sentence, so it includes its comments. Sentence i spans bytes
+    offsets[i]:offsets[i + 1] and its first line is line_nrs[i]. file_size and
+    file_mtime_ns identify the version of the file the index was built from.
+    """
+    def __init__(self, sent_ids : List[str], offsets : array, line_nrs : array, file_size : int,
+                 file_mtime_ns : int = None):
+        self.sent_ids = sent_ids
+        self.offsets = offsets
+        self.line_nrs = line_nrs
+        self.file_size = file_size
+        self.file_mtime_ns = file_mtime_ns
+        self._positions = {sent_id: position for position, sent_id in enumerate(sent_ids)} # the last one wins, as in a Doc
+        if len(self._positions) < len(sent_ids):
+            warnings.warn('Warning! Sentence ids not unique!')
+
+    @staticmethod
+    def build(filename : str) -> OffsetIndex:
+        sent_ids, offsets, line_nrs = [], array(_OFFSET_TYPECODE, [0]), array(_OFFSET_TYPECODE)
+        position, line_nr = 0, 0
+        start_line_nr, sent_id, has_nodes = 1, None, False
+        mtime_ns = os.stat(filename).st_mtime_ns # before reading, so that a change while reading shows
+        with open(filename, 'rb') as fptr:
+            for line in fptr:
+                position += len(line)
+                line_nr += 1
+                line = line.strip()
+                if not line:
+                    if has_nodes: # blank line ends the sentence
+                        sent_ids.append(sent_id)
+                        offsets.append(position)
+                        line_nrs.append(start_line_nr)
+                        start_line_nr, sent_id, has_nodes = line_nr + 1, None, False
+                    continue
+                if line[:1] == b'#':
+                    sent_id = _sent_id_of_comment(line) or sent_id
+                    continue
+                has_nodes = True
+        if has_nodes:
+            sent_ids.append(sent_id)
+            offsets.append(position)
+            line_nrs.append(start_line_nr)
+        return OffsetIndex(sent_ids, offsets, line_nrs, position, mtime_ns)
+
+    def position(self, sent_id : str) -> int|None:
+        return self._positions.get(sent_id)
+
+    def is_current(self, filename : str) -> bool:
+        """True if the file has the size and modification time the index was built for."""
+        stat = os.stat(filename)
+        return self.file_size == stat.st_size and self.file_mtime_ns == stat.st_mtime_ns
+
+    def __len__(self):
+        return len(self.sent_ids)
+
+    def save(self, filename : str):
+        header = json.dumps({'version': _VERSION, 'file_size': self.file_size, 'file_mtime_ns': self.file_mtime_ns,
+                             'sent_ids': self.sent_ids},
+                            ensure_ascii=False).encode('utf-8')
+        offsets, line_nrs = array(_OFFSET_TYPECODE, self.offsets), array(_OFFSET_TYPECODE, self.line_nrs)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+            line_nrs.byteswap()
+        with open(filename, 'wb') as fptr:
+            fptr.write(_MAGIC + struct.pack('<Q', len(header)))
+            fptr.write(header)
+            fptr.write(offsets.tobytes())
+            fptr.write(line_nrs.tobytes())
+
+    @staticmethod
+    def load(filename : str) -> OffsetIndex:
+        with open(filename, 'rb') as fptr:
+            content = fptr.read()
+        if not content.startswith(_MAGIC):
+            raise Exception('File "%s" is not a sentence offset index' % filename)
+        start = len(_MAGIC) + 8
+        header_len, = struct.unpack('<Q', content[len(_MAGIC):start])
+        header = json.loads(content[start:start + header_len].decode('utf-8'))
+        if header.get('version') != _VERSION:
+            raise Exception('Unsupported sentence offset index version %s in "%s"' % (str(header.get('version')), filename))
+        nr_sentences = len(header['sent_ids'])
+        offsets, line_nrs = array(_OFFSET_TYPECODE), array(_OFFSET_TYPECODE)
+        start += header_len
+        offsets.frombytes(content[start:start + (nr_sentences + 1) * offsets.itemsize])
+        start += (nr_sentences + 1) * offsets.itemsize
+        line_nrs.frombytes(content[start:start + nr_sentences * line_nrs.itemsize])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+            line_nrs.byteswap()
+        return OffsetIndex(header['sent_ids'], offsets, line_nrs, header['file_size'], header.get('file_mtime_ns'))
+
+    def __str__(self):
+        return 'OffsetIndex(%d sentences, %d bytes)' % (len(self), self.file_size)
+    def __repr__(self):
+        return str(self)
+
+class LazyDoc(DocBase):
+    """Doc that reads the sentences of a conllu file only when they are accessed.
+
+    An OffsetIndex locates each sentence in the file, so get_sentence() and
+    get_node() seek to and parse a single sentence. The most recently used
+    sentences are kept in a cache; iterating over the doc (e.g. in search())
+    reads the sentences one at a time.
+
+    Args:
+        filename: Conllu file.
+        offsets: Offset index of the file; built by scanning the file if not given.
+        cache_size: Number of parsed sentences kept in the cache.
+        lazy: If True, node fields are decoded only when first accessed.
+    """
+    def __init__(self, filename : str, offsets : OffsetIndex = None, cache_size : int = 128, lazy : bool = True):
+        self.filename = filename
+        self.offsets = offsets if offsets is not None else OffsetIndex.build(filename)
+        if os.path.getsize(filename) != self.offsets.file_size:
+            raise Exception('Offset index does not match file "%s"' % filename)
+        self.cache_size = cache_size
+        self.lazy = lazy
+        self._cache : OrderedDict[int, Sentence] = OrderedDict()
+        self._file = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def open(filename : str, index_filename : str = None, cache_size : int = 128, lazy : bool = True) -> LazyDoc:
+        """Opens a conllu file using the offset index saved in index_filename.
+        If the index file is missing or was built for another version of the
+        conllu file, the index is built and saved there."""
+        offsets = None
+        if index_filename is not None and os.path.exists(index_filename):
+            offsets = OffsetIndex.load(index_filename)
+            if not offsets.is_current(filename):
+                offsets = None
+        if offsets is None:
+            offsets = OffsetIndex.build(filename)
+            if index_filename is not None:
+                offsets.save(index_filename)
+        return LazyDoc(filename, offsets, cache_size, lazy)
+
+    def _read(self, position : int) -> Sentence:
+        start, end = self.offsets.offsets[position], self.offsets.offsets[position + 1]
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'rb')
+            self._file.seek(start)
+            text = self._file.read(end - start).decode('utf-8')
+        line_base = self.offsets.line_nrs[position] - 1
+        for node_lines, special_data in iter_conllu_blocks(StringIO(text)):
+            return Sentence([conllu_to_node(line, line_base + line_nr, self.lazy) for line_nr, line in node_lines],
+                            **special_data)
+        raise Exception('No sentence at bytes %d-%d of "%s"' % (start, end, self.filename))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    def __enter__(self) -> LazyDoc:
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+    def __iter__(self) -> Generator[Sentence, None, None]:
+        for position in range(len(self)):
+            yield self[position]
+    def __getitem__(self, position : int|slice) -> Sentence|List[Sentence]:
+        if isinstance(position, slice):
+            return [self[p] for p in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('LazyDoc index out of range')
+        with self._lock:
+            sentence = self._cache.get(position)
+            if sentence is not None:
+                self._cache.move_to_end(position)
+                return sentence
+        sentence = self._read(position)
+        with self._lock:
+            # another thread may have read the same sentence meanwhile; keep the cached one
+            sentence = self._cache.setdefault(position, sentence)
+            self._cache.move_to_end(position)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sentence
+    def index(self, sentence : Sentence) -> int:
+        position = self.offsets.position(sentence.sent_id) if sentence is not None else None
+        if position is not None:
+            return position
+        raise ValueError('%s is not in doc' % str(sentence))
+
+    def get_sentence(self, sent_id) -> Sentence|None:
+        position = self.offsets.position(sent_id)
+        return None if position is None else self[position]
+
+    def sentence_position(self, sent_id : str) -> int|None:
+        return self.offsets.position(sent_id)
+    def search(self, src: str|Search, index : 'SentenceIndex' = None,
+               limit : int = None) -> Generator[Tree|Match, None, None]:
+        """Searches all sentences in the file, reading them one at a time (see Doc.search())."""
+        return super().search(src, index, limit=limit)
+    def build_index(self) -> 'SentenceIndex':
+        return conllu_path.index.SentenceIndex.build(self)
+    def build_statistics(self) -> 'NodeStatistics':
+        return conllu_path.planner.NodeStatistics.build(self)
+    def to_doc(self) -> Doc:
+        """Loads all the sentences into a regular Doc."""
+        return Doc(list(self))
+
+    def __str__(self):
+        return 'LazyDoc(%s, %d sentences)' % (self.filename, len(self))
+    def __repr__(self):
+        return str(self)
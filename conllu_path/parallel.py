@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Generator, Iterable, Union
+
+from conllu_path.conllu import iter_sentences_from_conllu, iter_sentences_from_conllu_str, sentence_to_conllu
+from conllu_path.search import Search, Match
+from conllu_path.sentence import Sentence
+from conllu_path.tree import Tree
+
+# Compact form of a search result, as sent back from worker processes: the id of
+# the matching node for single-node searches, or a tuple of the node id and the compact
+# forms of the next matches for path searches.
+CompactMatch = Union[str, Tuple[str, list]]
+
+_worker_sentences : List[Sentence]|None = None
+
+def compact_match(match : Tree|Match) -> CompactMatch:
+    if isinstance(match, Tree):
+        return str(match.id())
+    return str(match.node.id()), [compact_match(m) for m in match.next_matches]
+
+def resolve_match(sentence : Sentence, match : CompactMatch) -> Tree|Match:
+    """Rebuilds the Tree or Match that a compact match stands for, in the given sentence."""
+    if isinstance(match, str):
+        return sentence.get_node(match)
+    node_id, next_matches = match
+    return Match(sentence.get_node(node_id), [resolve_match(sentence, m) for m in next_matches])
+
+def _get_mp_context():
+    # with fork, workers inherit the sentences instead of receiving them pickled
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def _init_worker(sentences : List[Sentence]|None):
+    global _worker_sentences
+    _worker_sentences = sentences
+
+def _search_sentences(search : Search, sentences : Iterable[Sentence]) -> List[Tuple[int, str, List[CompactMatch]]]:
+    results = []
+    for index, sentence in enumerate(sentences):
+        matches = sentence.search(search)
+        if matches:
+            results.append((index, sentence.sent_id, [compact_match(m) for m in matches]))
+    return results
+
+def _search_shard(task : Tuple[Search, int, int, str|None]) -> List[Tuple[int, str, List[CompactMatch]]]:
+    search, start, stop, conllu_str = task
+    if conllu_str is None:
+        sentences = _worker_sentences[start:stop]
+    else:
+        sentences = iter_sentences_from_conllu_str(conllu_str)
+    return [(start + index, sent_id, matches) for index, sent_id, matches in _search_sentences(search, sentences)]
+
+def _search_file(task : Tuple[Search, str]) -> List[Tuple[int, str, List[CompactMatch]]]:
+    search, filename = task
+    return _search_sentences(search, iter_sentences_from_conllu(filename))
+
+def search_sentences_parallel(sentences : List[Sentence], src : str|Search, workers : int = None,
+                              shard_size : int = None) -> Generator[Tree|Match, None, None]:
+    """Searches a list of sentences in a process pool.
+
+    The sentences are split into shards of consecutive sentences. Workers send back
+    compact results (node ids), which are resolved to nodes of the original sentences,
+    so the output is the same, and in the same order, as that of Doc.search().
+
+    Args:
+        sentences: The sentences to search, usually a Doc.
+        src: Search expression or compiled Search.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        shard_size: Number of sentences per task. By default, each worker
+            gets about four shards.
+    """
+    search = Search.compile(src)
+    context = _get_mp_context()
+    workers = workers if workers else multiprocessing.cpu_count()
+    if not shard_size:
+        shard_size = max(1, len(sentences) // (workers * 4))
+    inherit = context.get_start_method() == 'fork'
+    tasks = [(search, start, min(start + shard_size, len(sentences)),
+              None if inherit else ''.join(sentence_to_conllu(s) for s in sentences[start:start+shard_size]))
+             for start in range(0, len(sentences), shard_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(sentences if inherit else None,)) as executor:
+        for shard_results in executor.map(_search_shard, tasks):
+            for index, _, matches in shard_results:
+                for match in matches:
+                    yield resolve_match(sentences[index], match)
+
+def search_conllu_files(filenames : Iterable[str], src : str|Search,
+                        workers : int = None) -> Generator[Tuple[str, CompactMatch], None, None]:
+    """Searches conllu files in a process pool, one task per file.
+
+    Yields:
+        Tuples of (sent_id, compact match), in the order of the files and
+        of the sentences within them, i.e. the order of a serial search.
+    """
+    search = Search.compile(src)
+    tasks = [(search, filename) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_get_mp_context()) as executor:
+        for file_results in executor.map(_search_file, tasks):
+            for _, sent_id, matches in file_results:
+                for match in matches:
+                    yield sent_id, match
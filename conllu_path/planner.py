@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Generator, Iterable, List, Set
+
+from conllu_path.index import node_terms, TERM_VALUE_SEP, INDEXED_FIELDS, INDEXED_DICT_FIELDS, INDEXED_KEY_FIELDS
+from conllu_path.search import Search, Match
+from conllu_path.search_evaluator import Evaluator, ValueComparer, Operation, Operator
+from conllu_path.sentence import Sentence, Doc, DocObserver
+from conllu_path.tree import Tree
+
+class NodeStatistics(DocObserver):
+    """Value frequencies per field, counted in nodes, used to estimate how many
+    nodes a search condition matches.
+
+    The counted values are the index terms of conllu_path.index: lemma, upos and
+    deprel values, each feats.X=Y value and each misc.X key. Statistics built with
+    Doc.build_statistics() count the sentences added to the doc; changes of node
+    data are not counted, since they change the estimates very little.
+    """
+    def __init__(self, term_counts : Dict[str, int] = None, nr_nodes : int = 0):
+        self.term_counts = Counter(term_counts) if term_counts else Counter()
+        self.nr_nodes = nr_nodes
+
+    @staticmethod
+    def build(sentences : Iterable[Sentence]) -> NodeStatistics:
+        statistics = NodeStatistics()
+        statistics.add(sentences)
+        return statistics
+
+    def add(self, sentences : Iterable[Sentence]):
+        for sentence in sentences:
+            for node in sentence.sequence:
+                if node.id().in_tree():
+                    self.term_counts.update(node_terms(node))
+                    self.nr_nodes += 1
+
+    def sentences_added(self, doc : Doc, start : int):
+        self.add(doc[start:])
+
+    def doc_reset(self, doc : Doc):
+        statistics = NodeStatistics.build(doc)
+        self.term_counts, self.nr_nodes = statistics.term_counts, statistics.nr_nodes
+
+    def selectivity(self, evaluator : Evaluator) -> float|None:
+        """Returns the estimated fraction of nodes that match evaluator,
+        or None if it cannot be estimated."""
+        if isinstance(evaluator, ValueComparer):
+            return self._comparer_selectivity(evaluator)
+        if isinstance(evaluator, Operation):
+            left = self.selectivity(evaluator.left)
+            if evaluator.operator == Operator.NOT:
+                return None if left is None else 1.0 - left
+            right = self.selectivity(evaluator.right)
+            if evaluator.operator == Operator.AND:
+                return _known_min([left, right])
+            if left is None or right is None:
+                return None
+            return min(1.0, left + right)
+        return None # constants and conditions on relatives of the node
+
+    def _comparer_selectivity(self, comparer : ValueComparer) -> float|None:
+        key = list(comparer.key)
+        if not self.nr_nodes:
+            return None
+        if len(key) == 2 and key[0] in INDEXED_KEY_FIELDS:
+            return self.term_counts['.'.join(key)] / self.nr_nodes
+        if not ((len(key) == 1 and key[0] in INDEXED_FIELDS) or
+                (len(key) == 2 and key[0] in INDEXED_DICT_FIELDS)):
+            return None
+        prefix = '.'.join(key) + TERM_VALUE_SEP
+        match_fn = comparer.regex.fullmatch if comparer.operator == '=' else comparer.regex.search
+        count = sum(c for term, c in self.term_counts.items()
+                    if term.startswith(prefix) and match_fn(term[len(prefix):]))
+        return min(1.0, count / self.nr_nodes)
+
+    def __str__(self):
+        return 'NodeStatistics(%d nodes, %d values)' % (self.nr_nodes, len(self.term_counts))
+    def __repr__(self):
+        return str(self)
+
+def _known_min(values : List[float|None]) -> float|None:
+    known = [v for v in values if v is not None]
+    return min(known) if known else None
+
+_inverse_path_descriptions = {
+    '/': 'parent', '//': 'ancestors', './': 'self and parent', './/': 'self and ancestors',
+    '.': 'self', '<': 'parent, if before it', '>': 'parent, if after it', '../': 'children',
+}
+
+def _ancestors(node : Tree) -> List[Tree]:
+    ancestors = []
+    while isinstance(node.parent, Tree):
+        node = node.parent
+        ancestors.append(node)
+    return ancestors
+
+def _inverse_candidates(path_type : str, node : Tree) -> List[Tree]:
+    """Returns the nodes from which node is reached by the path."""
+    parent = node.parent if isinstance(node.parent, Tree) else None
+    if path_type == '/':
+        return [parent] if parent else []
+    if path_type == '//':
+        return _ancestors(node)
+    if path_type == './':
+        return [node] + ([parent] if parent else [])
+    if path_type == './/':
+        return [node] + _ancestors(node)
+    if path_type == '.':
+        return [node]
+    if path_type == '<':
+        return [parent] if parent and node.id() < parent.id() else []
+    if path_type == '>':
+        return [parent] if parent and node.id() > parent.id() else []
+    if path_type == '../':
+        return node.children()
+    raise Exception("Unknown path " + str(path_type))
+
+class PlannedSearch(Search):
+    """Search that starts matching at its most selective node condition.
+
+    Instead of evaluating the evaluator sequence top-down from the start node,
+    the nodes matching the anchor (the condition with the lowest estimated
+    selectivity) are found first and matched against the rest of the sequence.
+    The preceding conditions are then checked only on the nodes that lead to
+    them, going up through the inverse of each path. The result is the same,
+    Match structure and order included, as that of Search.match().
+
+    Matches below the anchor are shared by all the paths that lead to the
+    same anchor node.
+    """
+    def __init__(self, search : str|Search, statistics : NodeStatistics):
+        search = Search.compile(search)
+        super().__init__(search.evaluator_sequence)
+        self.expr_src = search.expr_src
+        self.selectivities = [statistics.selectivity(e.evaluator) for e in self.evaluator_sequence]
+        estimates = [1.0 if s is None else s for s in self.selectivities]
+        self.anchor = min(range(len(estimates)), key=lambda i: estimates[i]) if estimates else 0
+        if estimates and estimates[self.anchor] >= estimates[0]:
+            self.anchor = 0
+
+    def plan_steps(self) -> List[str]:
+        """Returns a description of the steps the search will take."""
+        sequence = self.evaluator_sequence
+        if self.anchor == 0:
+            return ['match %s top-down from the start node' % ''.join(str(e) for e in sequence)]
+        steps = ['scan all nodes for [%s]' % str(sequence[self.anchor].evaluator)]
+        if self.anchor < len(sequence) - 1:
+            steps.append('match %s from each anchor node' % ''.join(str(e) for e in sequence[self.anchor + 1:]))
+        for level in range(self.anchor - 1, -1, -1):
+            steps.append('go to %s, keep nodes matching [%s]' %
+                         (_inverse_path_descriptions[sequence[level + 1].path_type], str(sequence[level].evaluator)))
+        steps.append('keep nodes reached from the start node by %s' % sequence[0].path_type)
+        return steps
+
+    def explain_plan(self) -> str:
+        lines = ['%s%s  (selectivity %s)' % ('* ' if i == self.anchor else '  ', str(e),
+                                             'unknown' if s is None else '%.6f' % s)
+                 for i, (e, s) in enumerate(zip(self.evaluator_sequence, self.selectivities))]
+        lines += ['%d. %s' % (i + 1, step) for i, step in enumerate(self.plan_steps())]
+        return '\n'.join(lines)
+
+    def iter_match(self, tree : Tree) -> Generator[Match|Tree, None, None]:
+        for match in self.match(tree): # matching starts from the anchor, so all matches are found together
+            yield match
+    def match(self, tree : Tree) -> List[Match]|List[Tree]:
+        if not tree or self.anchor == 0:
+            return super().match(tree)
+        sequence = self.evaluator_sequence
+        top = tree
+        while isinstance(top.parent, Tree):
+            top = top.parent
+        anchor_matches : Dict[Tree, Match] = {}
+        for node in top.projection():
+            if sequence[self.anchor].condition()(node):
+                match = Match(node)
+                if Search._match_recursive(match, sequence[self.anchor + 1:]):
+                    anchor_matches[node] = match
+        if not anchor_matches:
+            return []
+        viable : List[Set[Tree]] = [set()] * self.anchor + [set(anchor_matches)]
+        for level in range(self.anchor - 1, -1, -1):
+            reached = {n for node in viable[level + 1]
+                       for n in _inverse_candidates(sequence[level + 1].path_type, node)}
+            viable[level] = {n for n in reached if sequence[level].condition()(n)}
+
+        def expand(node : Tree, level : int) -> List[Match]:
+            matches = []
+            for n in sequence[level].candidates(node):
+                if n not in viable[level]:
+                    continue
+                if level == self.anchor:
+                    matches.append(Match(n, anchor_matches[n].next_matches))
+                else:
+                    matches.append(Match(n, expand(n, level + 1)))
+            return matches
+
+        matches = expand(tree, 0)
+        return matches if len(sequence) > 1 else [m.node for m in matches]
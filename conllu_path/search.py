@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List
+import functools
+from collections import Counter
+from typing import Callable, Generator, Iterable, List
 
 import conllu_path
 from conllu_path.search_evaluator import NodePathEvaluator
@@ -33,13 +35,42 @@ class Match:
         return self.__str__()
 
 
+SEARCH_CACHE_SIZE = 512
+
 class Search:
     def __init__(self, expr : str|List[NodePathEvaluator]):
         self.expr_src = None
         if isinstance(expr, str):
             self.expr_src = expr
-            expr = parse_evaluator(expr)
+            expr = Search.compile(expr).evaluator_sequence
         self.evaluator_sequence = expr
+    @staticmethod
+    def compile(expr : str|Search) -> Search:
+        """Returns the compiled Search for an expression, parsing it only once.
+
+        Compiled searches are kept in a process-wide LRU cache of
+        SEARCH_CACHE_SIZE entries, keyed by the expression text.
+        """
+        if isinstance(expr, Search):
+            return expr
+        return _compile_search(expr)
+    @staticmethod
+    def clear_cache():
+        _compile_search.cache_clear()
+    def plan(self, statistics : 'NodeStatistics') -> 'PlannedSearch':
+        """Returns a search with the same results that starts matching at the
+        condition that the statistics estimate to be the most selective."""
+        return conllu_path.planner.PlannedSearch(self, statistics)
+    def explain(self, sentences : Iterable[conllu_path.Sentence]|conllu_path.Sentence) -> 'SearchProfile':
+        """Runs the search on sentences (e.g. a doc) with every evaluator instrumented
+        and returns how often each one was called, how many nodes it visited and
+        matched and how long it took; print the result for a table by evaluator.
+
+        Only the profiled run is instrumented; match() and the other methods are not.
+        """
+        profile = conllu_path.explain.SearchProfile(self)
+        profile.run(sentences)
+        return profile
     def match(self, tree : Tree) -> List[Match]|List[Tree]:
         if not tree:
             return []
@@ -48,18 +79,80 @@ class Search:
             return []
         matches = _match.next_matches
         return matches if len(self.evaluator_sequence) > 1 else [m.node for m in matches]
+    def iter_match(self, tree : Tree) -> Generator[Match|Tree, None, None]:
+        """Yields the results of match() one at a time, in the same order. Each result
+        is found only when it is requested, so a caller that stops early (e.g. after
+        the first few results) does not pay for the rest."""
+        if not tree:
+            return
+        first, rest = self.evaluator_sequence[0], self.evaluator_sequence[1:]
+        condition = first.condition()
+        for node in first.candidates(tree):
+            if not condition(node):
+                continue
+            if not rest:
+                yield node
+                continue
+            match = Match(node)
+            if Search._match_recursive(match, rest):
+                yield match
+    def exists(self, tree : Tree) -> bool:
+        """Returns True if match() would find anything, stopping at the first complete match."""
+        return bool(tree) and Search._exists(tree, self.evaluator_sequence)
     @staticmethod
     def _match_recursive(match : Match, evaluator_sequence : List[NodePathEvaluator]) -> bool:
         if not evaluator_sequence:
             return True
-        if not evaluator_sequence[0].evaluate(match.node):
+        matching_nodes = evaluator_sequence[0].find(match.node)
+        if not matching_nodes:
             return False
         match.next_matches = []
-        for node in evaluator_sequence[0].matching_nodes:
+        for node in matching_nodes:
             child = Match(node)
             if Search._match_recursive(child, evaluator_sequence[1:]):
                 match.next_matches.append(child)
         return bool(match.next_matches)
+    def count(self, tree : Tree, level : int = 0) -> int:
+        """Returns the number of matches at level of the match trees (0 for the nodes
+        that match() returns, 1 for their next matches etc.), without building them."""
+        counts = [0]
+        def add(node : Tree):
+            counts[0] += 1
+        self._tally(tree, level, add)
+        return counts[0]
+    def group(self, tree : Tree, key_path : str|List[str], level : int = 0, counter : Counter = None) -> Counter:
+        """Counts the matches at level (see count()) by their data at key_path
+        (in string form, see Tree.sdata()), adding to counter if given."""
+        counter = counter if counter is not None else Counter()
+        def add(node : Tree):
+            counter[node.sdata(key_path)] += 1
+        self._tally(tree, level, add)
+        return counter
+    def _tally(self, tree : Tree, level : int, add : Callable[[Tree], None]):
+        if not 0 <= level < len(self.evaluator_sequence):
+            raise Exception('Level %d out of range for a search of %d nodes' % (level, len(self.evaluator_sequence)))
+        if not tree:
+            return
+        for node in self.evaluator_sequence[0].find(tree):
+            Search._tally_recursive(node, self.evaluator_sequence[1:], level, add)
+    @staticmethod
+    def _tally_recursive(node : Tree, evaluator_sequence : List[NodePathEvaluator], level : int,
+                         add : Callable[[Tree], None]):
+        # a node below level 0 only has matches at the counted level if its own
+        # continuation is complete, so nodes are added only once that is checked
+        if level == 0:
+            if Search._exists(node, evaluator_sequence):
+                add(node)
+            return
+        for child in evaluator_sequence[0].find(node):
+            Search._tally_recursive(child, evaluator_sequence[1:], level - 1, add)
+    @staticmethod
+    def _exists(node : Tree, evaluator_sequence : List[NodePathEvaluator]) -> bool:
+        if not evaluator_sequence:
+            return True
+        condition = evaluator_sequence[0].condition()
+        return any(condition(n) and Search._exists(n, evaluator_sequence[1:])
+                   for n in evaluator_sequence[0].candidates(node))
     def __str__(self):
         return ''.join([str(e) for e in self.evaluator_sequence])
     def __repr__(self):
@@ -71,6 +164,12 @@ class Search:
     # def negation(self) -> Search:
     #     return ChainedSearch('!', self)
 
+@functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _compile_search(expr : str) -> Search:
+    search = Search(parse_evaluator(expr))
+    search.expr_src = expr
+    return search
+
 # class ChainedSearch(Search):
 #     OPERATORS = ('&', '|', '!')
 #     def __init__(self, operator : str, left : Search, right : Search = None):
@@ -91,7 +190,8 @@ class Search:
 #         if self._operator == '|':
 #             return list(left.union(right))
 #         #negation
-#         return self.left.evaluator_sequence[0].non_matching_nodes
+#         evaluator = self.left.evaluator_sequence[0]
+#         return [n for n in evaluator.candidates(tree) if n not in evaluator.find(tree)]
 #
 # def matches_to_nodes(matches : List[Tree]|List[Match]) -> List[Tree]:
 #     if matches and isinstance(matches[0], Match):
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List
+
+from conllu_path.search import Search, Match
+from conllu_path.search_evaluator import Evaluator, Predicate, ValueComparer, ConstantEvaluator, Operation, NodePathEvaluator
+from conllu_path.sentence import Sentence
+from conllu_path.tree import Tree
+
+def _signature(evaluator : Evaluator) -> Hashable:
+    """Returns a key that is the same for evaluators that check the same condition."""
+    if isinstance(evaluator, ValueComparer):
+        return 'value', evaluator.operator, tuple(evaluator.key), tuple(sorted(evaluator.values))
+    if isinstance(evaluator, ConstantEvaluator):
+        return 'constant', str(evaluator)
+    if isinstance(evaluator, Operation):
+        return ('operation', evaluator.operator, _signature(evaluator.left),
+                None if evaluator.right is None else _signature(evaluator.right))
+    if isinstance(evaluator, NodePathEvaluator):
+        return 'path', evaluator.path_type, _signature(evaluator.evaluator)
+    return 'object', id(evaluator)
+
+def _sub_evaluators(evaluator : Evaluator) -> Iterable[Evaluator]:
+    yield evaluator
+    if isinstance(evaluator, Operation):
+        yield from _sub_evaluators(evaluator.left)
+        if evaluator.right is not None:
+            yield from _sub_evaluators(evaluator.right)
+    elif isinstance(evaluator, NodePathEvaluator):
+        yield from _sub_evaluators(evaluator.evaluator)
+
+class SearchBatch:
+    """Runs many searches over a doc in a single pass.
+
+    Conditions that occur more than once in the searches (the same comparison,
+    and/or/not of the same conditions, or the same nested path) are compiled once
+    and evaluated at most once per node; their results are kept until the next
+    sentence. The results of run() and count() are keyed by query, i.e. by the
+    expression strings (or Search objects) the batch was created with.
+
+    A SearchBatch keeps per-sentence state while it runs, so it should not be run
+    from several threads at once.
+    """
+    def __init__(self, queries : Iterable[str|Search]):
+        self.queries = list(dict.fromkeys(queries))
+        compiled = [Search.compile(q) for q in self.queries]
+        occurrences = Counter(_signature(e) for search in compiled
+                              for path in search.evaluator_sequence for e in _sub_evaluators(path.evaluator))
+        self._shared = {signature for signature, count in occurrences.items() if count > 1}
+        self._conditions : Dict[Hashable, Predicate] = {}
+        self._caches : List[Dict[Tree, bool]] = []
+        self.searches : Dict[str|Search, Search] = {}
+        for query, search in zip(self.queries, compiled):
+            shared = Search([path.with_condition(self._compile(path.evaluator)) for path in search.evaluator_sequence])
+            shared.expr_src = search.expr_src
+            self.searches[query] = shared
+
+    def _compile(self, evaluator : Evaluator) -> Predicate:
+        signature = _signature(evaluator)
+        if signature in self._conditions:
+            return self._conditions[signature]
+        condition = evaluator.compile(self._compile)
+        if signature in self._shared and not isinstance(evaluator, ConstantEvaluator):
+            condition = self._memoized(condition)
+        self._conditions[signature] = condition
+        return condition
+
+    def _memoized(self, condition : Predicate) -> Predicate:
+        cache : Dict[Tree, bool] = {}
+        self._caches.append(cache)
+        def memoized(node : Tree) -> bool:
+            value = cache.get(node)
+            if value is None:
+                value = cache[node] = condition(node)
+            return value
+        return memoized
+
+    def _sentences(self, sentences : Iterable[Sentence], index : 'SentenceIndex' = None):
+        """Yields each sentence with the searches to run on it, clearing the shared results in between."""
+        candidates = {}
+        if index is not None:
+            for query, search in self.searches.items():
+                positions = index.candidates(search)
+                if positions is not None:
+                    candidates[query] = set(positions)
+        for position, sentence in enumerate(sentences):
+            yield sentence, [(query, search) for query, search in self.searches.items()
+                             if query not in candidates or position in candidates[query]]
+            for cache in self._caches:
+                cache.clear()
+
+    def run(self, sentences : Iterable[Sentence], index : 'SentenceIndex' = None) -> Dict[str|Search, List[Tree|Match]]:
+        """Returns the matches of each query, as Doc.search() would yield them.
+
+        Args:
+            sentences: A doc or any iterable of sentences.
+            index: SentenceIndex built from the same sentences, to skip those a query cannot match.
+        """
+        results = {query: [] for query in self.queries}
+        for sentence, searches in self._sentences(sentences, index):
+            for query, search in searches:
+                results[query].extend(search.match(sentence.root))
+        return results
+
+    def count(self, sentences : Iterable[Sentence], level : int = 0,
+              index : 'SentenceIndex' = None) -> Dict[str|Search, int]:
+        """Returns the number of matches of each query at the given level (see Search.count())."""
+        results = {query: 0 for query in self.queries}
+        for sentence, searches in self._sentences(sentences, index):
+            for query, search in searches:
+                results[query] += search.count(sentence.root, level)
+        return results
+
+    def __len__(self):
+        return len(self.queries)
+    def __str__(self):
+        return 'SearchBatch(%d searches, %d shared conditions)' % (len(self), len(self._shared))
+    def __repr__(self):
+        return str(self)
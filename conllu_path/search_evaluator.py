@@ -1,26 +1,46 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Iterable, Set, List
+from typing import Callable, Iterable, Set, List
 
 from conllu_path import Tree
 
 import re
 
+from conllu_path.node_data import FixedKeysNode
 from conllu_path.tree import FIXED_EXPR_LEMMA_KEY
 
 REGEX_DELIM_START = '{'
 REGEX_DELIM_STOP = '}'
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+
+Predicate = Callable[[Tree], bool]
 
 class Evaluator:
     def evaluate(self, node : Tree) -> bool:
         pass
+    def compile(self, compile_child : Callable[[Evaluator], Predicate] = None) -> Predicate:
+        """Returns a function of a node that gives the same result as evaluate(),
+        specialized for this evaluator so that it avoids re-dispatching on every node.
+
+        Args:
+            compile_child: Function used to compile the evaluators nested in this one
+                (by default, their own compile()), e.g. to share them between searches.
+        """
+        return self.evaluate
 
 class ConstantEvaluator(Evaluator):
     def __init__(self, value : bool):
         self._value = value
     def evaluate(self, node : Tree) -> bool:
         return self._value
+    def compile(self, compile_child : Callable[[Evaluator], Predicate] = None) -> Predicate:
+        value = self._value
+        return lambda node: value
+    def __str__(self):
+        return '*' if self._value else '!*'
+    def __repr__(self):
+        return self.__str__()
 
 class ValueComparer(Evaluator):
     def __init__(self, operator : str, key : str, values : Iterable[str]):
@@ -36,6 +56,12 @@ class ValueComparer(Evaluator):
         except Exception as e:
             raise Exception('Error in regex %s: %s' % (values_str, str(e)))
 
+    def literal_values(self) -> Set[str]|None:
+        """Returns the values if they are plain strings, None if they form a regex."""
+        if any(c in REGEX_SPECIAL_CHARS for v in self.values for c in v):
+            return None
+        return self.values
+
     def evaluate(self, node : Tree) -> bool:
         actual_values = node.sdata(self.key) if self.key == [FIXED_EXPR_LEMMA_KEY]\
             else node.data(self.key)
@@ -50,11 +76,55 @@ class ValueComparer(Evaluator):
             return any([self.regex.fullmatch(v) for v in actual_values])
         else: # operator '~'
             return any([self.regex.search(v) for v in actual_values])
+    def value_matcher(self) -> Callable[[object], bool]:
+        """Returns a function that tells whether data read at this comparer's key
+        (a string, a collection of strings or None) satisfies the comparison."""
+        literals = self.literal_values()
+        if literals is not None and self.operator == '=':
+            literals = frozenset(literals)
+            match = literals.__contains__
+        elif literals is not None: # operator '~'
+            literals = tuple(literals)
+            match = lambda v: any(l in v for l in literals)
+        elif self.operator == '=':
+            match = self.regex.fullmatch
+        else:
+            match = self.regex.search
+        def matcher(actual_values) -> bool:
+            if type(actual_values) is str:
+                return bool(match(actual_values))
+            if type(actual_values) in (list, tuple) or isinstance(actual_values, Iterable):
+                return any(match(v) for v in actual_values)
+            return False
+        return matcher
+    def compile(self, compile_child : Callable[[Evaluator], Predicate] = None) -> Predicate:
+        get = _value_getter(self.key)
+        matcher = self.value_matcher()
+        return lambda node: matcher(get(node))
     def __str__(self):
         return '.'.join(self.key) + self.operator + ','.join(self.values)
     def __repr__(self):
         return self.__str__()
 
+def _value_getter(key : List[str]) -> Callable[[Tree], object]:
+    """Returns a function reading the data at key from a node the way ValueComparer.evaluate() does,
+    indexing straight into the field list of FixedKeysNode data for single-key paths."""
+    if key == [FIXED_EXPR_LEMMA_KEY]:
+        return lambda node: node.sdata(key)
+    if len(key) != 1:
+        return lambda node: node.data(key)
+    field = key[0]
+    def get(node : Tree):
+        data = node._data
+        if type(data) is FixedKeysNode:
+            index = data.key_index_dict.get(field)
+            return None if index is None else data._dlist[index]
+        return data.data(key)
+    return get
+
+def _compile(evaluator : Evaluator) -> Predicate:
+    return evaluator.compile()
+
 class Operator(Enum):
     AND = '&'
     OR = '|'
@@ -75,43 +145,78 @@ class Operation(Evaluator):
         left_val = self.left.evaluate(node)
         right_val = self.right.evaluate(node) if self.right else None
         return _op_dict[self.operator](left_val, right_val)
+    def compile(self, compile_child : Callable[[Evaluator], Predicate] = None) -> Predicate:
+        compile_child = compile_child if compile_child is not None else _compile
+        left = compile_child(self.left)
+        if self.operator == Operator.NOT:
+            return lambda node: not left(node)
+        right = compile_child(self.right)
+        if self.operator == Operator.AND:
+            return lambda node: left(node) and right(node)
+        return lambda node: left(node) or right(node)
     def __str__(self):
         return str(self.operator.value) + '(' + self.left.__str__() + (' ' + self.right.__str__() if self.right else '') + ')'
     def __repr__(self):
         return str(self)
 
 
+_AXES = {
+    '../': lambda node: [node.parent] if node.parent else [], # parent
+    '/': lambda node: node.children(), # children
+    '//': lambda node: node.descendants(), # all descendants
+    './': lambda node: [node] + node.children(), # children plus self
+    './/': lambda node: node.projection(), # all descendants plus self
+    '.': lambda node: [node], # current head_node
+    '<': lambda node: node.before(),
+    '>': lambda node: node.after(),
+}
+
 class NodePathEvaluator(Evaluator):
     def __init__(self, path_type : str, evaluator : Evaluator):
         self.path_type = path_type
         self.evaluator = evaluator
-        self.matching_nodes = []
-        self.non_matching_nodes = []
+        self._compiled = None
+    def candidates(self, node : Tree) -> List[Tree]:
+        """Returns the nodes reached from node by this evaluator's path."""
+        axis = _AXES.get(self.path_type)
+        if axis is None:
+            raise Exception("Unknown path " + str(self.path_type))
+        return axis(node)
+    def condition(self) -> Predicate:
+        """Returns the compiled condition on the nodes of this evaluator's path, built on first use."""
+        if self._compiled is None:
+            self._compiled = self.evaluator.compile()
+        return self._compiled
+    def find(self, node : Tree) -> List[Tree]:
+        """Returns the nodes on this evaluator's path from node that match its conditions.
+
+        The result belongs to the caller; no match state is kept on the evaluator,
+        so the same evaluator can be used concurrently from several threads.
+        """
+        condition = self.condition()
+        return [n for n in self.candidates(node) if condition(n)]
     def evaluate(self, node : Tree) -> bool:
-        if self.path_type == '../': # parent
-            node_list = [node.parent] if node.parent else []
-        elif self.path_type == '/': # children
-            node_list = node.children()
-        elif self.path_type == '//': # all descendants
-            node_list = [c for c in node.traverse() if c is not node]
-        elif self.path_type == './': # children plus self
-            node_list = [node] + node.children()
-        elif self.path_type == './/': # all descendants plus self
-            node_list = list(node.traverse())
-        elif self.path_type == '.': # current head_node
-            node_list = [node]
-        elif self.path_type == '<':
-            node_list = node.before() #[child for child in node.children() if before(child, node)]
-        elif self.path_type == '>':
-            node_list = node.after() #[child for child in node.children() if not before(child, node)]
-        else:
+        return any(self.evaluator.evaluate(n) for n in self.candidates(node))
+    def compile(self, compile_child : Callable[[Evaluator], Predicate] = None) -> Predicate:
+        axis = _AXES.get(self.path_type)
+        if axis is None:
             raise Exception("Unknown path " + str(self.path_type))
-        self.matching_nodes = [n for n in node_list if self.evaluator.evaluate(n)]
-        self.non_matching_nodes = [n for n in node_list if n not in self.matching_nodes]
-        return bool(self.matching_nodes)
+        condition = self.condition() if compile_child is None else compile_child(self.evaluator)
+        return lambda node: any(condition(n) for n in axis(node))
+
+    def with_condition(self, condition : Predicate) -> NodePathEvaluator:
+        """Returns a copy of this evaluator that checks its nodes with condition, which
+        must give the same results as the compiled evaluator (e.g. a memoized version)."""
+        evaluator = NodePathEvaluator(self.path_type, self.evaluator)
+        evaluator._compiled = condition
+        return evaluator
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_compiled'] = None # closures cannot be pickled; compiled again on first use
+        return state
 
     def __str__(self):
         return self.path_type + '[' + self.evaluator.__str__() + ']'
     def __repr__(self):
         return self.__str__()
-
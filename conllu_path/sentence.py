@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import functools
+import itertools
+import typing
 import warnings
+from array import array
 from collections import defaultdict, Counter
-from typing import List, Generator, Dict
+from typing import Callable, List, Generator, Dict, Iterable, Tuple
 
 import conllu_path
 from conllu_path.node_id import NodeID
@@ -30,6 +34,10 @@ class Sentence:
         sent_id (str): Exception error code.
 
     """
+    # functions called as observer(sentence, node, path) when a node's data is assigned
+    _observers : List[Callable[[Sentence, Tree, str|List[str]], None]]|None = None
+    _node_positions : Dict[NodeID, int]|None = None
+
     def __init__(self, node_sequence : List[Tree], **kwargs):
         self.sequence = node_sequence
         self.sent_id = kwargs.get('sent_id')
@@ -116,11 +124,37 @@ class Sentence:
     def get_node(self, id : str) -> Tree|None:
         id = NodeID(id)
         return self._id_dict.get(id)
+    def node_position(self, id : str|NodeID) -> int|None:
+        """Returns the index in the sequence of the node with the given id, or None."""
+        if self._node_positions is None:
+            self._node_positions = {n.id(): i for i, n in enumerate(self.sequence)}
+        return self._node_positions.get(id)
+
+    def search(self, src: str|Search, limit : int = None) -> List[Tree]|List[Match]:
+        """Returns the matches of a search in the sentence, or only the first limit ones."""
+        search = Search.compile(src)
+        if limit is None:
+            return search.match(self.root)
+        return list(itertools.islice(search.iter_match(self.root), limit))
+
+    def exists(self, src: str|Search) -> bool:
+        return Search.compile(src).exists(self.root)
+
+    def observe(self, observer : Callable[[Sentence, Tree, str|List[str]], None]):
+        """Adds a function to be called as observer(sentence, node, path) after Tree.assign() changes a node."""
+        if self._observers is None:
+            self._observers = []
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def node_changed(self, node : Tree, path : str|List[str]):
+        for observer in self._observers or ():
+            observer(self, node, path)
 
-    def search(self, src: str|Search) -> List[Tree]|List[Match]:
-        if isinstance(src, str):
-            src = Search(src)
-        return src.match(self.root)
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_observers', None) # observers belong to the docs holding the sentence in this process
+        return state
 
     def __str__(self):
         text = self.text if self.text else ' '.join([n.sdata('form') for n in self.sequence])
@@ -129,22 +163,35 @@ class Sentence:
     def __repr__(self):
         return str(self)
 
-class Doc(List[Sentence]):
-    def __init__(self, sentences : List[Sentence]):
-        super().__init__(sentences)
-        self._id_dict : Dict[str, Sentence] = {s.sent_id : s for s in self}
-        if len(self._id_dict) != len(self):
-            warnings.warn('Warning! Sentence ids not unique!')
+class DocObserver:
+    """Base class of the structures derived from a doc that follow its changes
+    (see Doc.add_observer()), such as SentenceIndex and NodeStatistics."""
+    def sentences_added(self, doc : Doc, start : int):
+        """Called after the sentences from position start to the end of the doc were appended."""
+    def node_changed(self, doc : Doc, position : int, node : Tree, path : str|List[str]):
+        """Called after Tree.assign() changed the data of node, in the sentence at position."""
+    def doc_reset(self, doc : Doc):
+        """Called after sentences were inserted, removed, replaced or reordered."""
 
-    def __add__(self, other : List[Sentence]) -> Doc:
-        return Doc(list(self) + list(other))
+def _resetting(method):
+    """Wraps a list method that can move sentences to other positions in the doc."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._reset()
+        return result
+    return wrapper
 
-    def __iadd__(self, other) -> Doc:
-        self.__init__(list(self) + list(other))
-        return self
+class DocBase:
+    """Methods shared by Doc, ColumnarDoc and LazyDoc, which only need the
+    sentences by position (len(), [] and iteration), get_sentence(),
+    sentence_position() and index().
 
-    def get_sentence(self, sent_id) -> Sentence|None:
-        return self._id_dict.get(sent_id)
+    Node uids can also be encoded as integers (see encode_uid()): the position
+    of the sentence in the doc shifted left by UID_NODE_BITS, plus the position
+    of the node in the sentence. The codes sort in the order of the nodes in the doc.
+    """
+    UID_NODE_BITS = 32
 
     def get_node(self, uid : str) -> Tree|None:
         if Tree.UID_SEPARATOR not in uid:
@@ -167,39 +214,279 @@ class Doc(List[Sentence]):
             node_id1 = NodeID(node_id1)
             node_id2 = NodeID(node_id2)
             return -1 if node_id1 < node_id2 else 1
-        sent1_index = self.index(self.get_sentence(sent_id1))
-        sent2_index = self.index(self.get_sentence(sent_id2))
+        sent1_index = self.sentence_position(sent_id1)
+        sent2_index = self.sentence_position(sent_id2)
+        if sent1_index is None or sent2_index is None:
+            raise Exception('Sentence %s not in doc' % (sent_id1 if sent1_index is None else sent_id2))
         return -1 if sent1_index < sent2_index else 1
 
+    def encode_uid(self, uid : str) -> int:
+        """Returns the integer code of a node uid (see the class docstring)."""
+        if Tree.UID_SEPARATOR not in uid:
+            raise Exception('Invalid uid "%s"' % str(uid))
+        sent_id, node_id = uid.rsplit(Tree.UID_SEPARATOR, 1)
+        position = self.sentence_position(sent_id)
+        node_position = None if position is None else self[position].node_position(node_id)
+        if node_position is None:
+            raise Exception('Node %s not in doc' % uid)
+        return (position << self.UID_NODE_BITS) | node_position
+
+    def encode_uids(self, uids : Iterable[str]) -> array:
+        """Returns the integer codes of uids as an array of unsigned 64-bit integers,
+        which can be sorted and compared in bulk (with sorted(), or as a NumPy array)."""
+        return array('Q', [self.encode_uid(uid) for uid in uids])
+
+    def _decode(self, code : int) -> Tuple[Sentence|None, Tree|None]:
+        """Returns the sentence and the node of an integer uid code, or None, None
+        if the code is out of the range of the doc."""
+        position, node_position = divmod(code, 1 << self.UID_NODE_BITS)
+        if not 0 <= position < len(self):
+            return None, None
+        sentence = self[position]
+        if node_position >= len(sentence.sequence):
+            return None, None
+        return sentence, sentence.sequence[node_position]
+
+    def decode_uid(self, code : int) -> str:
+        """Returns the uid of the node with the given integer code."""
+        sentence, node = self._decode(code)
+        if node is None:
+            raise Exception('Node %s not in doc' % str(code))
+        return sentence.sent_id + Tree.UID_SEPARATOR + str(node.id())
+
+    def sort_uids(self, uids : Iterable[str]) -> List[str]:
+        """Returns uids sorted in the order of their nodes in the doc."""
+        return [self.decode_uid(code) for code in sorted(self.encode_uids(uids))]
+
+    def get_nodes(self, uids : Iterable[str|int]) -> List[Tree|None]:
+        """Returns the nodes of uids or integer uid codes, with None for uids not in the doc.
+        Each sentence is looked up once, however many of the nodes are in it."""
+        sentences, nodes = {}, []
+        for uid in uids:
+            if isinstance(uid, int):
+                nodes.append(self._decode(uid)[1])
+                continue
+            if Tree.UID_SEPARATOR not in uid:
+                raise Exception('Invalid uid "%s"' % str(uid))
+            sent_id, node_id = uid.rsplit(Tree.UID_SEPARATOR, 1)
+            if sent_id not in sentences:
+                sentences[sent_id] = self.get_sentence(sent_id)
+            sentence = sentences[sent_id]
+            nodes.append(None if sentence is None else sentence.get_node(node_id))
+        return nodes
+
     def iter_nodes(self, from_node : Tree = None, **kwargs) -> Generator[Tree, None, None]:
-        start_sentence = from_node.sentence() if from_node else self[0]
-        try:
-            start_index = self.index(start_sentence)
-        except:
-            raise Exception('Could not find sentence %s containing node %s is doc' % (str(from_node), str(start_sentence)))
-        for sentence in self[start_index:]:
-            for node in sentence.iter_nodes(from_node, **kwargs):
+        start_index = 0
+        if from_node:
+            start_sentence = from_node.sentence()
+            try:
+                start_index = self.index(start_sentence)
+            except:
+                raise Exception('Could not find sentence %s containing node %s is doc' % (str(from_node), str(start_sentence)))
+            # the node's own sentence, not self[start_index]: a LazyDoc may have read that sentence again since
+            for node in start_sentence.iter_nodes(from_node, **kwargs):
+                yield node
+            start_index += 1
+        for position in range(start_index, len(self)): # by position, so sentences are read one at a time
+            for node in self[position].iter_nodes(**kwargs):
                 yield node
-            from_node = None
 
-    def search(self, src: str|Search) -> Generator[Tree|Match, None, None]:
-        for sentence in self:
-            for match in sentence.search(src):
+    def search(self, src: str|Search, index : 'SentenceIndex' = None, batch : bool = False,
+               limit : int = None) -> Generator[Tree|Match, None, None]:
+        """Searches all sentences in the doc.
+
+        Matches are found as they are requested, so the search stops when the caller
+        stops iterating or, if limit is given, after limit results.
+        If a SentenceIndex built from this doc is given, only the sentences
+        it selects as candidates for the search are matched against it.
+        If batch is True (only for a ColumnarDoc, and with NumPy installed), the
+        conditions on the first node are evaluated for the whole doc at once
+        (see conllu_path.batch.search_batch()).
+        """
+        if batch:
+            matches = conllu_path.batch.search_batch(self, src, index)
+        else:
+            matches = self._iter_matches(Search.compile(src), index)
+        for match in itertools.islice(matches, limit):
+            yield match
+
+    def _iter_matches(self, search : Search, index : 'SentenceIndex' = None) -> Generator[Tree|Match, None, None]:
+        for sentence in self._candidate_sentences(search, index):
+            for match in search.iter_match(sentence.root):
                 yield match
 
+    def exists(self, src: str|Search, index : 'SentenceIndex' = None) -> bool:
+        """Returns True if the search matches in any sentence, stopping at the first match."""
+        src = Search.compile(src)
+        return any(src.exists(sentence.root) for sentence in self._candidate_sentences(src, index))
+
+    def count(self, src: str|Search, level : int = 0, index : 'SentenceIndex' = None) -> int:
+        """Returns the number of matches of a search in the doc at the given level
+        (0 counts the results of search(); see Search.count())."""
+        src = Search.compile(src)
+        return sum(src.count(sentence.root, level) for sentence in self._candidate_sentences(src, index))
+
+    def group_by(self, src: str|Search, key_path : str|List[str], level : int = 0,
+                 index : 'SentenceIndex' = None) -> Counter:
+        """Counts the matches of a search in the doc at the given level by their
+        data at key_path (e.g. 'lemma', 'feats.Number' or 'flemma').
+
+        Example:
+            The lemmas of the objects of verbs, most frequent first:
+            doc.group_by('.//[upos=VERB]/[deprel=obj]', 'lemma', level=1).most_common()
+        """
+        src = Search.compile(src)
+        counter = Counter()
+        for sentence in self._candidate_sentences(src, index):
+            src.group(sentence.root, key_path, level, counter)
+        return counter
+
+    def _candidate_sentences(self, search : Search, index : 'SentenceIndex' = None) -> Iterable[Sentence]:
+        if index is None:
+            return self
+        if index.nr_sentences != len(self):
+            raise Exception('Index built for %d sentences used with a doc of %d sentences' %
+                            (index.nr_sentences, len(self)))
+        positions = index.candidates(search)
+        return self if positions is None else [self[i] for i in positions]
+
+    def to_conllu(self, filename : str|typing.IO = None) -> str|None:
+        """Returns the doc in conllu format if no filename is given, otherwise
+        writes it into filename, which may also be a stream (see conllu.write_conllu())."""
+        if not filename:
+            return ''.join([conllu_path.conllu.sentence_to_conllu(sentence) for sentence in self])
+        conllu_path.conllu.write_conllu(self, filename)
+
+class Doc(DocBase, List[Sentence]):
+    """List of sentences, with their sentence ids and positions mapped.
+
+    Appending sentences (append(), extend(), +=) only maps the new sentences;
+    the other list operations that change the doc map it again. Observers (see
+    add_observer()) are told about the changes so they can update what they
+    derived from the doc instead of building it again.
+    """
+    def __init__(self, sentences : List[Sentence]):
+        super().__init__(sentences)
+        self._id_dict : Dict[str, Sentence] = {}
+        self._position_dict : Dict[Sentence, int] = {}
+        self._observers : List[DocObserver] = []
+        self._map(0)
+
+    def _map(self, start : int):
+        unique = True
+        for position in range(start, len(self)):
+            sentence = self[position]
+            if sentence.sent_id in self._id_dict:
+                unique = False
+            self._id_dict[sentence.sent_id] = sentence
+            self._position_dict.setdefault(sentence, position)
+            if self._observers:
+                sentence.observe(self._node_changed)
+        if not unique:
+            warnings.warn('Warning! Sentence ids not unique!')
+
+    def _reset(self):
+        self._id_dict, self._position_dict = {}, {}
+        self._map(0)
+        for observer in self._observers:
+            observer.doc_reset(self)
+
+    def _node_changed(self, sentence : Sentence, node : Tree, path : str|List[str]):
+        position = self._position_dict.get(sentence)
+        if position is None: # removed from the doc
+            return
+        for observer in self._observers:
+            observer.node_changed(self, position, node, path)
+
+    def add_observer(self, observer : DocObserver):
+        """Tells observer about the sentences added to the doc, the changes of
+        node data and other changes of the doc from now on."""
+        if not self._observers:
+            for sentence in self:
+                sentence.observe(self._node_changed)
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer : DocObserver):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def append(self, sentence : Sentence):
+        self.extend([sentence])
+
+    def extend(self, sentences : Iterable[Sentence]):
+        """Appends sentences, mapping only them (so a doc can be grown in batches in linear time)."""
+        start = len(self)
+        super().extend(sentences)
+        self._map(start)
+        for observer in self._observers:
+            observer.sentences_added(self, start)
+
+    def __add__(self, other : List[Sentence]) -> Doc:
+        return Doc(list(self) + list(other))
+
+    def __iadd__(self, other) -> Doc:
+        self.extend(other)
+        return self
+
+    insert = _resetting(list.insert)
+    remove = _resetting(list.remove)
+    pop = _resetting(list.pop)
+    clear = _resetting(list.clear)
+    sort = _resetting(list.sort)
+    reverse = _resetting(list.reverse)
+    __setitem__ = _resetting(list.__setitem__)
+    __delitem__ = _resetting(list.__delitem__)
+
+    def __reduce__(self):
+        return Doc, (list(self),) # mapped again when unpickled, without the observers
+
+    def get_sentence(self, sent_id) -> Sentence|None:
+        return self._id_dict.get(sent_id)
+
+    def sentence_position(self, sent_id : str) -> int|None:
+        """Returns the position in the doc of the sentence with sent_id, or None."""
+        sentence = self._id_dict.get(sent_id)
+        return None if sentence is None else self._position_dict.get(sentence)
+
+    def index(self, sentence : Sentence, *args) -> int:
+        position = self._position_dict.get(sentence) if not args else None
+        return list.index(self, sentence, *args) if position is None else position
+
+    def build_index(self) -> 'SentenceIndex':
+        """Returns a SentenceIndex of the doc, which is kept up to date as the doc changes."""
+        index = conllu_path.index.SentenceIndex.build(self)
+        self.add_observer(index)
+        return index
+
+    def build_statistics(self) -> 'NodeStatistics':
+        """Returns the NodeStatistics of the doc, which are kept up to date as sentences are added."""
+        statistics = conllu_path.planner.NodeStatistics.build(self)
+        self.add_observer(statistics)
+        return statistics
+
+    def search_parallel(self, src: str|Search, workers : int = None) -> Generator[Tree|Match, None, None]:
+        """Same as search(), but the sentences are searched in a pool of worker processes."""
+        return conllu_path.parallel.search_sentences_parallel(self, src, workers)
+
     @staticmethod
-    def from_conllu(filename : str) -> Doc:
-        return Doc(conllu_path.iter_sentences_from_conllu(filename))
-
-    def to_conllu(self, filename : str = None) -> str|None:
-        buffer = ''
-        fptr = open(filename, 'w', encoding='utf-8') if filename else None
-        for sentence in self:
-            if fptr:
-                fptr.write(conllu_path.conllu.sentence_to_conllu(sentence))
-            else:
-                buffer += conllu_path.conllu.sentence_to_conllu(sentence)
-        if fptr:
-            fptr.close()
-        else:
-            return buffer
+    def from_conllu(filename : str, lazy : bool = False) -> Doc:
+        """Loads a conllu file. If lazy is True, node fields are decoded only when first accessed."""
+        return Doc(conllu_path.iter_sentences_from_conllu(filename, lazy))
+
+    @staticmethod
+    def open_conllu(filename : str, index_filename : str = None, cache_size : int = 128) -> 'LazyDoc':
+        """Opens a conllu file without loading it. Sentences are read from the
+        file when they are accessed, using an offset index of the file that is
+        kept in index_filename (if given) so it is built only once."""
+        return conllu_path.offsets.LazyDoc.open(filename, index_filename, cache_size)
+
+    def save_binary(self, filename : str):
+        """Saves the doc in a binary format that load_binary() can memory-map."""
+        conllu_path.binary.save_binary(self, filename)
+
+    @staticmethod
+    def load_binary(filename : str) -> 'MappedDoc':
+        """Opens a doc saved with save_binary(). Sentences are read from the
+        memory-mapped file only when they are accessed."""
+        return conllu_path.binary.load_binary(filename)
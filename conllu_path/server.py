@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+from conllu_path.binary import _MAGIC as _BINARY_MAGIC
+from conllu_path.conllu import conllu_fields, node_to_conllu
+from conllu_path.search import Search, Match
+from conllu_path.sentence import Doc, Sentence
+from conllu_path.tree import Tree
+
+DEFAULT_MAX_RESULTS = 1000
+DEFAULT_TIMEOUT = 10.0 # seconds
+MAX_REQUEST_SIZE = 1 << 20
+
+_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    def __init__(self, message : str, status : int = 400):
+        super().__init__(message)
+        self.status = status
+
+def match_to_json(match : Tree|Match) -> str|dict:
+    """Returns the uid of a matching node, or for path searches its uid and next matches."""
+    if isinstance(match, Tree):
+        return match.uid()
+    return {'uid': match.node.uid(), 'next': [match_to_json(m) for m in match.next_matches]}
+
+def node_to_json(node : Tree) -> dict:
+    """Returns the uid of a node, its conllu line, the fields of the line and the text of its sentence."""
+    line = node_to_conllu(node)
+    return {'uid': node.uid(),
+            'fields': dict(zip(conllu_fields, line.split('\t'))),
+            'conllu': line,
+            'text': node.sentence().text}
+
+class QueryServer:
+    """Local HTTP/JSON service that keeps docs (Doc, ColumnarDoc, MappedDoc or
+    LazyDoc) loaded in memory and searches them.
+
+    Endpoints (parameters are taken from the query string, or from a JSON object
+    in the body of a POST request):
+
+        GET  /docs                              names and sizes of the served docs
+        POST /search    doc, expr, limit        matches, as uids (see match_to_json())
+        POST /count     doc, expr, level        number of matches
+        POST /get_node  uid (doc)               the node's fields and conllu line
+
+    Requests run in a thread pool so that the server keeps answering while searches
+    run. Each request gets at most the server's timeout and result limit (smaller
+    values may be asked for); a search or count that hits either stops early and
+    says so in its response. Compiled searches are shared by all requests through
+    the cache of Search.compile(). The doc can be left out when only one is served.
+
+    To serve conllu files from the command line:
+
+        python -m conllu_path.server corpus=./ro_rrt-ud-train.conllu --port 8080 --index
+
+    Args:
+        docs: The docs to serve, by name.
+        indexes: SentenceIndexes built from the docs, by doc name, to speed up their searches.
+        max_results: Most matches a search request returns.
+        timeout: Most seconds a request may search for.
+        workers: Number of threads that run requests.
+    """
+    def __init__(self, docs : Dict[str, Doc], indexes : Dict[str, 'SentenceIndex'] = None,
+                 max_results : int = DEFAULT_MAX_RESULTS, timeout : float = DEFAULT_TIMEOUT, workers : int = None):
+        self.docs = dict(docs)
+        self.indexes = dict(indexes) if indexes else {}
+        self.max_results = max_results
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._handlers = {'/docs': self.list_docs, '/search': self.search,
+                          '/count': self.count, '/get_node': self.get_node}
+
+    def _doc(self, params : dict) -> Tuple[str, Doc]:
+        name = params.get('doc')
+        if name is None and len(self.docs) == 1:
+            name = next(iter(self.docs))
+        if name is not None and not isinstance(name, str):
+            raise RequestError('doc must be a string')
+        if name not in self.docs:
+            raise RequestError('Unknown doc %s' % str(name), 404)
+        return name, self.docs[name]
+
+    def _limits(self, params : dict) -> Tuple[int, float]:
+        try:
+            limit = max(0, min(int(params.get('limit', self.max_results)), self.max_results))
+            timeout = min(float(params.get('timeout', self.timeout)), self.timeout)
+        except (TypeError, ValueError):
+            raise RequestError('limit and timeout must be numbers') from None
+        if not math.isfinite(timeout):
+            raise RequestError('timeout must be a finite number')
+        return limit, time.monotonic() + timeout
+
+    def _sentences(self, name : str, doc : Doc, search : Search, deadline : float) -> Iterable[Sentence]:
+        """Yields the sentences to search, raising _Timeout once the deadline has passed."""
+        for sentence in doc._candidate_sentences(search, self.indexes.get(name)):
+            if time.monotonic() > deadline:
+                raise _Timeout()
+            yield sentence
+
+    @staticmethod
+    def _search(params : dict) -> Search:
+        if 'expr' not in params:
+            raise RequestError('Missing expr')
+        try:
+            return Search.compile(params['expr'])
+        except Exception as e:
+            raise RequestError(str(e)) from None
+
+    def list_docs(self, params : dict) -> dict:
+        return {'docs': [{'name': name, 'sentences': len(doc), 'indexed': name in self.indexes}
+                         for name, doc in self.docs.items()]}
+
+    def search(self, params : dict) -> dict:
+        name, doc = self._doc(params)
+        search = self._search(params)
+        limit, deadline = self._limits(params)
+        matches, timed_out = [], False
+        try:
+            for sentence in self._sentences(name, doc, search, deadline):
+                for match in search.iter_match(sentence.root):
+                    if len(matches) == limit:
+                        return {'matches': matches, 'truncated': True, 'timed_out': False}
+                    matches.append(match_to_json(match))
+        except _Timeout:
+            timed_out = True
+        return {'matches': matches, 'truncated': False, 'timed_out': timed_out}
+
+    def count(self, params : dict) -> dict:
+        name, doc = self._doc(params)
+        search = self._search(params)
+        _, deadline = self._limits(params)
+        try:
+            level = int(params.get('level', 0))
+        except (TypeError, ValueError):
+            raise RequestError('level must be a number') from None
+        if not 0 <= level < len(search.evaluator_sequence):
+            raise RequestError('Level %d out of range for a search of %d nodes' % (level, len(search.evaluator_sequence)))
+        count, timed_out = 0, False
+        try:
+            for sentence in self._sentences(name, doc, search, deadline):
+                count += search.count(sentence.root, level)
+        except _Timeout:
+            timed_out = True
+        return {'count': count, 'timed_out': timed_out}
+
+    def get_node(self, params : dict) -> dict:
+        if 'uid' not in params:
+            raise RequestError('Missing uid')
+        uid = params['uid']
+        docs = [self._doc(params)[1]] if 'doc' in params or len(self.docs) == 1 else list(self.docs.values())
+        for doc in docs:
+            try:
+                node = doc.get_node(uid)
+            except Exception as e:
+                raise RequestError(str(e)) from None
+            if node is not None:
+                return node_to_json(node)
+        raise RequestError('Unknown node %s' % uid, 404)
+
+    async def handle(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+        """Answers one HTTP request on a connection, then closes it."""
+        try:
+            status, response = await self._respond(reader)
+        except Exception as e: # malformed request
+            status, response = 400, {'error': str(e)}
+        body = json.dumps(response).encode('utf-8')
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                      'Connection: close\r\n\r\n' % (status, _STATUS.get(status, ''), len(body))).encode('ascii'))
+        writer.write(body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader : asyncio.StreamReader) -> Tuple[int, dict]:
+        method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        length = int(headers.get('content-length', 0))
+        if length > MAX_REQUEST_SIZE:
+            return 413, {'error': 'Request of %d bytes is too large' % length}
+        if method == 'POST' and length:
+            body = json.loads(await reader.readexactly(length))
+            if not isinstance(body, dict):
+                return 400, {'error': 'The request body must be a JSON object'}
+            params.update(body)
+        elif method != 'GET':
+            return 405, {'error': 'Method %s not allowed' % method}
+        handler = self._handlers.get(url.path)
+        if handler is None:
+            return 404, {'error': 'Unknown endpoint %s' % url.path}
+        try:
+            return 200, await asyncio.get_running_loop().run_in_executor(self._executor, handler, params)
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def start(self, host : str = '127.0.0.1', port : int = 8080) -> asyncio.AbstractServer:
+        """Starts serving on host:port in the running event loop and returns the asyncio server."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def serve_forever(self, host : str = '127.0.0.1', port : int = 8080):
+        async def serve():
+            server = await self.start(host, port)
+            async with server:
+                await server.serve_forever()
+        try:
+            asyncio.run(serve())
+        finally:
+            self._executor.shutdown()
+
+class _Timeout(Exception):
+    pass
+
+def _load_doc(filename : str, lazy : bool) -> Doc:
+    with open(filename, 'rb') as fptr:
+        if fptr.read(len(_BINARY_MAGIC)) == _BINARY_MAGIC:
+            return Doc.load_binary(filename)
+    return Doc.from_conllu(filename, lazy)
+
+def main(args : List[str] = None):
+    parser = argparse.ArgumentParser(description='Serves searches on conllu docs kept in memory.')
+    parser.add_argument('docs', nargs='+', help='conllu files (or files saved with Doc.save_binary()), as name=filename or filename')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--index', action='store_true', help='build a SentenceIndex for each doc')
+    parser.add_argument('--lazy', action='store_true', help='decode node fields only when first accessed')
+    parser.add_argument('--max-results', type=int, default=DEFAULT_MAX_RESULTS)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(args)
+    docs, indexes = {}, {}
+    for spec in args.docs:
+        name, _, filename = spec.rpartition('=')
+        name = name or os.path.splitext(os.path.basename(filename))[0]
+        docs[name] = _load_doc(filename, args.lazy)
+        if args.index:
+            indexes[name] = docs[name].build_index()
+        print('Loaded %s: %d sentences' % (name, len(docs[name])))
+    server = QueryServer(docs, indexes, args.max_results, args.timeout, args.workers)
+    print('Serving on http://%s:%d' % (args.host, args.port))
+    server.serve_forever(args.host, args.port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import typing
+import warnings
+from typing import Callable, Generator, List
+
+from conllu_path.conllu import conllu_fields, conllu_to_node, iter_conllu_blocks
+from conllu_path.search import Search, Match
+from conllu_path.search_evaluator import Evaluator, ValueComparer, Operation, Operator, NodePathEvaluator
+from conllu_path.sentence import Sentence
+from conllu_path.tree import Tree, FIXED_EXPR_LEMMA_KEY, FIXED_EXPR_LEMMA_SEPARATOR
+
+# a formula is a literal that must occur in the text, a tuple of an operator
+# and a list of formulas, or None if any text can match
+_ALWAYS = None
+
+def _formula_and(formulas : List) -> typing.Any:
+    formulas = [f for f in formulas if f is not _ALWAYS]
+    if not formulas:
+        return _ALWAYS
+    return formulas[0] if len(formulas) == 1 else (Operator.AND, formulas)
+
+def _formula_or(formulas : List) -> typing.Any:
+    if any(f is _ALWAYS for f in formulas):
+        return _ALWAYS
+    return formulas[0] if len(formulas) == 1 else (Operator.OR, formulas)
+
+def _comparer_formula(comparer : ValueComparer) -> typing.Any:
+    values = comparer.literal_values()
+    key = list(comparer.key)
+    if values is None or not key:
+        return _ALWAYS
+    if key == [FIXED_EXPR_LEMMA_KEY]:
+        if comparer.operator != '=':
+            return _ALWAYS
+        return _formula_or([_formula_and([l for l in v.split(FIXED_EXPR_LEMMA_SEPARATOR) if l])
+                            for v in values])
+    if key[0] not in conllu_fields or 'NONE' in values: # 'NONE' stands for a missing value
+        return _ALWAYS
+    return _formula_or([v for v in values if v] or [_ALWAYS])
+
+def _evaluator_formula(evaluator : Evaluator) -> typing.Any:
+    if isinstance(evaluator, NodePathEvaluator):
+        return _evaluator_formula(evaluator.evaluator)
+    if isinstance(evaluator, ValueComparer):
+        return _comparer_formula(evaluator)
+    if isinstance(evaluator, Operation):
+        if evaluator.operator == Operator.AND:
+            return _formula_and([_evaluator_formula(evaluator.left), _evaluator_formula(evaluator.right)])
+        if evaluator.operator == Operator.OR:
+            return _formula_or([_evaluator_formula(evaluator.left), _evaluator_formula(evaluator.right)])
+    return _ALWAYS
+
+def _compile_formula(formula) -> Callable[[str], bool]:
+    if formula is _ALWAYS:
+        return lambda text: True
+    if isinstance(formula, str):
+        return lambda text: formula in text
+    operator, formulas = formula
+    fns = [_compile_formula(f) for f in formulas]
+    if operator == Operator.AND:
+        return lambda text: all(fn(text) for fn in fns)
+    return lambda text: any(fn(text) for fn in fns)
+
+class RawFilter:
+    """Cheap test of whether the raw conllu text of a sentence can match a search.
+
+    Every plain value that a search compares against with '=' or '~' must occur
+    in the text of a sentence that matches it, so sentences whose text lacks the
+    required values (as combined by the search's and/or operators) are rejected
+    without being parsed. Regexes and negations do not restrict the text.
+    """
+    def __init__(self, search : str|Search):
+        self.search = Search.compile(search)
+        self.formula = _formula_and([_evaluator_formula(e) for e in self.search.evaluator_sequence])
+        self._accepts = _compile_formula(self.formula)
+    def filters(self) -> bool:
+        """Returns False if the filter accepts any text."""
+        return self.formula is not _ALWAYS
+    def accepts(self, text : str) -> bool:
+        return self._accepts(text)
+
+def search_conllu(file : typing.TextIO | str, src : str|Search, lazy : bool = True,
+                  prefilter : bool = True) -> Generator[Tree|Match, None, None]:
+    """Searches a conllu file one sentence at a time, without building a Doc.
+
+    Sentence blocks are read from the file as text. If prefilter is True, blocks
+    rejected by the RawFilter of the search are skipped before any node or tree
+    is built.
+
+    Args:
+        file: Filename or string buffer.
+        src: Search expression or compiled Search.
+        lazy: If True, node fields are decoded only when first accessed.
+        prefilter: If True, skip sentences whose text cannot match the search.
+
+    Yields:
+        The same nodes or matches as Doc.search() on the loaded file.
+    """
+    search = Search.compile(src)
+    raw_filter = RawFilter(search) if prefilter else None
+    if raw_filter is not None and not raw_filter.filters():
+        raw_filter = None
+    for node_lines, special_data in iter_conllu_blocks(file):
+        if raw_filter is not None and not raw_filter.accepts('\n'.join(line for _, line in node_lines)):
+            continue
+        sentence = Sentence([conllu_to_node(line, line_nr, lazy) for line_nr, line in node_lines], **special_data)
+        if not sentence.root:
+            warnings.warn('Error building sentence sent_id = %s: %s' % (sentence.sent_id, sentence.sanity_comment))
+        for match in sentence.search(search):
+            yield match
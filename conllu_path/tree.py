@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import abc
-from typing import Dict, List, Set, Generator
+from typing import Dict, List, Set, Generator, Tuple
 
 from conllu_path.node_data import NodeData
 from conllu_path.node_id import NodeID
@@ -9,6 +9,8 @@ from conllu_path.node_id import NodeID
 
 FIXED_EXPR_LEMMA_KEY = 'flemma'
 FIXED_EXPR_LEMMA_SEPARATOR = '_'
+# keys whose values the fixed expression lemmas of a node and of its parent are made of
+_FIXED_EXPR_SOURCE_KEYS = ('lemma', 'deprel')
 
 class Tree:
     UID_SEPARATOR = '/'
@@ -19,29 +21,51 @@ class Tree:
         self._before = []
         self._after = []
         self.parent = parent
+        self._span = None
+        self._flemma = None
         if children:
             self.set_children(children)
     def id(self) -> NodeID:
         return self._id
     def data(self, path: str | List[str] = None) -> NodeData | Set[str] | List[str] | str | None:
         if path == FIXED_EXPR_LEMMA_KEY or path == [FIXED_EXPR_LEMMA_KEY]: # return fixed expression lemmas
-            return ([self.sdata('lemma')] +
-                    [child.sdata('lemma') for child in self.children() if child.sdata('deprel') == 'fixed'])
+            return list(self._fixed_expr_lemmas()[0])
         return self._data.data(path)
     def sdata(self, path: str | List[str] = None) -> str:
         if path == FIXED_EXPR_LEMMA_KEY or path == [FIXED_EXPR_LEMMA_KEY]: # return fixed expression lemmas
-            return FIXED_EXPR_LEMMA_SEPARATOR.join(self.data(path))
+            return self._fixed_expr_lemmas()[1]
         return self._data.sdata(path)
+    def _fixed_expr_lemmas(self) -> Tuple[Tuple[str, ...], str]:
+        """Returns the lemmas of the node and of its fixed children, and their joined
+        form, computed on first use and kept until a lemma or deprel is assigned."""
+        if self._flemma is None:
+            lemmas = tuple([self.sdata('lemma')] +
+                           [child.sdata('lemma') for child in self._children if child.sdata('deprel') == 'fixed'])
+            self._flemma = lemmas, FIXED_EXPR_LEMMA_SEPARATOR.join(lemmas)
+        return self._flemma
     def assign(self, path: str|List[str], value : NodeData|Set|str) -> bool:
-        return self._data.assign(path, value)
+        changed = self._data.assign(path, value)
+        key = path.split(NodeData.PATH_SEPARATOR)[0] if isinstance(path, str) else path[0]
+        if key in _FIXED_EXPR_SOURCE_KEYS:
+            self._flemma = None
+            if isinstance(self.parent, Tree):
+                self.parent._flemma = None
+        sentence = self.sentence()
+        if sentence is not None and sentence._observers:
+            sentence.node_changed(self, path)
+        return changed
     def keys(self) -> List[str]:
         return self._data.keys()
     def to_dict(self) -> Dict[str, NodeData | Set | str | None]:
         return self._data.to_dict()
 
     def set_children(self, children : List['Tree']):
+        for node in [self] + children:
+            if node._span is not None:
+                _clear_spans(node._span[0])
         self._children = children
-        self._children.sort(key=lambda n : n.id()) # int(n.sdata('id')))
+        self._flemma = None
+        self._children.sort(key=lambda n : n.id().sort_key()) # int(n.sdata('id')))
         for child in self._children:
             child.parent = self
         # id = self.id_nr()
@@ -55,17 +79,28 @@ class Tree:
     def after(self) -> List[Tree]:
         return list(self._after)
 
+    def span(self) -> Tuple[List[Tree], int, int, int]:
+        """Returns the nodes of the whole tree in traverse() order, with this node's
+        position in that list and the start and end of its subtree, which is the
+        contiguous slice [start:end]. All the nodes are numbered on first use."""
+        if self._span is None:
+            top = self
+            while isinstance(top.parent, Tree):
+                top = top.parent
+            _number_nodes(top)
+        return self._span
+
     def traverse(self) -> Generator[Tree, None, None]:
-        for child in self.before():
-            for node in child.traverse():
-                yield node
-        yield self
-        for child in self.after():
-            for node in child.traverse():
-                yield node
+        for node in self.projection():
+            yield node
 
     def projection(self) -> List[Tree]:
-        return list(self.traverse())
+        order, start, _, end = self.span()
+        return order[start:end]
+
+    def descendants(self) -> List[Tree]:
+        order, start, position, end = self.span()
+        return order[start:position] + order[position + 1:end]
 
     def __str__(self):
         return "%s:%s" % (self.id(), self.sdata('form'))
@@ -79,4 +114,23 @@ class Tree:
         return node.parent
 
     def uid(self) -> str:
-        return self.sentence().sent_id + Tree.UID_SEPARATOR + str(self.id())
\ No newline at end of file
+        return self.sentence().sent_id + Tree.UID_SEPARATOR + str(self.id())
+
+def _number_nodes(top : Tree) -> List[Tree]:
+    """Lists the nodes under top in traverse() order, storing each node's span in it."""
+    order = []
+    def number(node : Tree):
+        start = len(order)
+        for child in node._before:
+            number(child)
+        position = len(order)
+        order.append(node)
+        for child in node._after:
+            number(child)
+        node._span = (order, start, position, len(order))
+    number(top)
+    return order
+
+def _clear_spans(order : List[Tree]):
+    for node in order:
+        node._span = None